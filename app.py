@@ -1,12 +1,22 @@
+import io
+import json
 import os
 import sys
-import pandas as pd
-import numpy as np
-import datetime
-from flask import Flask, render_template, request, send_file, send_from_directory
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
-import traceback
+import time
+import multiprocessing
+import tempfile
+from flask import (Flask, Response, abort, jsonify, render_template, request, send_file, send_from_directory,
+                   stream_with_context, url_for)
+
+from cache import SnapshotCache
+from ingest import SCHEMA_TAG, server_file_suffix
+from datasets import DatasetStore
+from jobs import JobManager
+from metrics import MetricsRegistry
+from results import DEFAULT_PER_PAGE, RESULT_LISTS, filter_items, filter_logs, paginate, result_summary
+from pipeline import (ExecutionLogger, PipelineError, append_day, check_pairs, load_plan, load_snapshot,
+                      parse_pairs, run_batch, run_pair_suggestion, run_pipeline, run_plan_audit)
+from suggest import write_suggestion_xlsx
 
 app = Flask(__name__)
 
@@ -19,493 +29,426 @@ else:
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     app = Flask(__name__)
 
-UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads') # Use CWD for user-accessible folders
-DOWNLOAD_FOLDER = os.path.join(os.getcwd(), 'downloads')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['DOWNLOAD_FOLDER'] = DOWNLOAD_FOLDER
-
-class ExecutionLogger:
-    def __init__(self):
-        self.logs = []
-    
-    def user(self, message, level='INFO'):
-        self._add_log(level, message, 'user')
-        
-    def dev(self, message, level='DEBUG'):
-        self._add_log(level, message, 'dev')
-        
-    def _add_log(self, level, message, category):
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        self.logs.append({
-            'time': timestamp, 
-            'level': level, 
-            'msg': message,
-            'category': category
-        })
-
-def parse_server_pairs(text):
-    pairs = []
-    seen = set()
-    duplicates = []
-    
-    if not text:
-        return pairs, duplicates
-        
-    lines = text.strip().split('\n')
-    for line in lines:
-        parts = line.replace('，', ',').split(',')
-        if len(parts) >= 2:
-            try:
-                s1 = int(parts[0].strip())
-                s2 = int(parts[1].strip())
-                
-                # Sort tuple to treat (A, B) same as (B, A)
-                pair_key = tuple(sorted((s1, s2)))
-                
-                if pair_key in seen:
-                    duplicates.append(f"{s1} ↔ {s2}")
-                else:
-                    seen.add(pair_key)
-                    pairs.append((s1, s2))
-            except ValueError:
-                continue
-    return pairs, duplicates
-
-def get_server_info(df, server_id):
-    row = df[df['区服ID'] == server_id]
-    if row.empty:
-        return None
-    return row.iloc[0]
+JOBS_FOLDER = os.path.join(os.getcwd(), 'jobs') # Use CWD for user-accessible folders
+CACHE_FOLDER = os.path.join(os.getcwd(), 'cache')
+
+# Every submission runs as a job in its own workspace under JOBS_FOLDER
+app.config['JOBS_FOLDER'] = JOBS_FOLDER
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_TTL_SECONDS'] = int(os.environ.get('JOB_TTL_SECONDS', 3600))
+
+# Plans of one batch processed concurrently (threads sharing the parsed snapshot)
+app.config['PLAN_WORKERS'] = int(os.environ.get('PLAN_WORKERS', 4))
+
+# Worker processes for parsing uploaded CSVs in parallel (1 = serial). The pool is shared by all
+# jobs and only used when several files add up to ingest.PARALLEL_MIN_BYTES; smaller uploads parse serially.
+app.config['INGEST_WORKERS'] = int(os.environ.get('INGEST_WORKERS', min(4, os.cpu_count() or 1)))
+# Parsed CSV snapshots are cached across runs, evicted LRU beyond this size (0 disables the cache)
+app.config['CACHE_FOLDER'] = CACHE_FOLDER
+app.config['CACHE_MAX_BYTES'] = int(os.environ.get('CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+snapshot_cache = None
+if app.config['CACHE_MAX_BYTES'] > 0:
+    snapshot_cache = SnapshotCache(app.config['CACHE_FOLDER'], app.config['CACHE_MAX_BYTES'], SCHEMA_TAG)
+
+# Run counts, stage latencies and processed rows since start, exposed at /metrics
+metrics = MetricsRegistry()
+
+job_manager = JobManager(app.config['JOBS_FOLDER'], app.config['JOB_WORKERS'], app.config['JOB_TTL_SECONDS'],
+                         on_finish=lambda job: metrics.record_run(job.status, job.logger.spans))
+
+# Uploaded datasets kept in memory for the JSON pair-check API, and on disk (DATASET_FOLDER)
+# so a later day's CSV can be appended to them incrementally
+app.config['DATASET_MAX_BYTES'] = int(os.environ.get('DATASET_MAX_BYTES', 1024 * 1024 * 1024))
+app.config['DATASET_IDLE_SECONDS'] = int(os.environ.get('DATASET_IDLE_SECONDS', 1800))
+app.config['DATASET_FOLDER'] = os.path.join(os.getcwd(), 'datasets')
+app.config['DATASET_RETENTION_SECONDS'] = int(os.environ.get('DATASET_RETENTION_SECONDS', 7 * 24 * 3600))
+dataset_store = DatasetStore(app.config['DATASET_MAX_BYTES'], app.config['DATASET_IDLE_SECONDS'],
+                             app.config['DATASET_FOLDER'], app.config['DATASET_RETENTION_SECONDS'])
+
+def save_server_files(files, folder):
+    # Saves uploaded server data files under their data extension; returns (path, display name) items
+    csv_items = []
+    for i, file in enumerate(files):
+        if file.filename == '':
+            continue
+        temp_path = os.path.join(folder, f'input_{i}{server_file_suffix(file.filename)}')
+        file.save(temp_path)
+        csv_items.append((temp_path, file.filename))
+    return csv_items
+
+
+def start_job():
+    # Saves the uploaded form into a fresh job workspace and queues the pipeline.
+    # Returns (job, None) or (None, error response).
+    csv_files = request.files.getlist('csv_files')
+    xlsx_file = request.files.get('xlsx_file')
+    pairs_text = request.form.get('pairs_text', '')
+    audit = bool(request.form.get('audit_plan'))
+    suggest = bool(request.form.get('suggest_pairs'))
+
+    if not csv_files or not xlsx_file:
+        return None, ("Missing files", 400)
+
+    job = job_manager.create()
+    logger = job.logger
+    logger.user("开始处理任务...")
+    logger.dev(f"初始化请求参数解析，任务ID: {job.id}")
+
+    # 1. Save files
+    xlsx_path = os.path.join(job.upload_dir, 'input.xlsx')
+    xlsx_file.save(xlsx_path)
+    logger.user("合服计划表 (XLSX) 上传成功")
+
+    csv_items = save_server_files(csv_files, job.upload_dir)
+
+    def task(job):
+        return run_pipeline(csv_items, xlsx_path, pairs_text, job.download_dir, job.logger,
+                            workers=app.config['INGEST_WORKERS'], cache=snapshot_cache,
+                            on_stage=job.set_stage, audit=audit, suggest=suggest)
+
+    return job_manager.submit(job, task), None
+
+
+# How often the event stream checks a running job for new logs, and sends a keep-alive comment
+SSE_POLL_SECONDS = 0.25
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def render_job(job):
+    # Counts and file names only; the lists and logs are fetched page by page by the page itself
+    summary = result_summary(job.result)
+    return render_template('index.html',
+                           success=True,
+                           job_id=job.id,
+                           log_count=len(job.logger.logs),
+                           **summary)
+
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        logger = ExecutionLogger()
-        try:
-            logger.user("开始处理任务...")
-            logger.dev("初始化请求参数解析")
-            
-            # 1. Save files
-            csv_files = request.files.getlist('csv_files')
-            xlsx_file = request.files['xlsx_file']
-            pairs_text = request.form['pairs_text']
-
-            if not csv_files or not xlsx_file:
-                return "Missing files", 400
-
-            xlsx_path = os.path.join(app.config['UPLOAD_FOLDER'], 'input.xlsx')
-            xlsx_file.save(xlsx_path)
-            logger.user("合服计划表 (XLSX) 上传成功")
-
-            # 2. Process CSVs (Merge Multiple)
-            logger.user(f"正在处理 {len(csv_files)} 个服务器数据文件...")
-            dfs = []
-            for i, file in enumerate(csv_files):
-                if file.filename == '':
-                    continue
-                temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f'input_{i}.csv')
-                file.save(temp_path)
-                try:
-                    # 尝试读取 CSV，跳过第一行
-                    df_temp = pd.read_csv(temp_path, header=1)
-                    dfs.append(df_temp)
-                    logger.dev(f"读取 CSV {file.filename} 成功，行数: {len(df_temp)}")
-                except Exception as e:
-                    logger.user(f"读取文件 {file.filename} 失败", 'ERROR')
-                    logger.dev(f"CSV 读取异常: {str(e)}", 'ERROR')
-            
-            if not dfs:
-                 return "没有有效的 CSV 文件", 400
-                 
-            df = pd.concat(dfs, ignore_index=True)
-            logger.user(f"数据合并完成，共 {len(df)} 条记录")
-            
-            # Ensure numeric columns
-            cols_to_numeric = ['区服ID', '前2名战力之和', '最高玩家累充金额', 'DAU', '跨服ID', 'code', '有效DAU', '当天付费账号数', '峰值在线', 'MAC_DAU', 'IP_DAU', '账号DAU', '总注册角色']
-            for col in cols_to_numeric:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                    if col in ['区服ID', 'DAU', '跨服ID', 'code', '总注册角色', '峰值在线', '当天付费账号数']: # Explicitly cast ID-like or count-like fields to int
-                         try:
-                            df[col] = df[col].astype(int)
-                         except:
-                            pass # Keep as float if int conversion fails (e.g. too large or weird values)
-
-            # Sort
-            logger.dev("执行数据排序: 前2名战力之和 (降序)")
-            df = df.sort_values(by='前2名战力之和', ascending=False).reset_index(drop=True)
-            df['真实排名'] = df.index + 1
-            total_servers = len(df)
-            
-            input_pairs, duplicates = parse_server_pairs(pairs_text)
-            
-            if duplicates:
-                logger.user(f"发现并忽略 {len(duplicates)} 组重复检测对", 'WARN')
-                if len(duplicates) <= 5:
-                    for dup in duplicates:
-                        logger.dev(f"忽略重复: {dup}", 'WARN')
-                else:
-                    logger.dev(f"重复列表 (前5个): {', '.join(duplicates[:5])}...", 'WARN')
-            
-            logger.user(f"解析输入：共 {len(input_pairs)} 组有效检测区服")
-            
-            alert_groups = [] 
-            normal_groups = [] 
-            
-            # 3. Primary Alert Check
-            logger.dev("开始执行初级警报检测 (Primary Check)")
-            for s1, s2 in input_pairs:
-                row1 = get_server_info(df, s1)
-                row2 = get_server_info(df, s2)
-                
-                if row1 is None:
-                    logger.user(f"警告：区服 {s1} 数据缺失，已跳过", 'WARN')
-                if row2 is None:
-                    logger.user(f"警告：区服 {s2} 数据缺失，已跳过", 'WARN')
-
-                if row1 is None or row2 is None:
-                    continue
-                    
-                rank1 = row1['真实排名']
-                rank2 = row2['真实排名']
-                
-                # Conditions
-                cond_a = abs(rank1 - rank2) <= 5
-                
-                top_25_threshold = total_servers * 0.25
-                cond_b = (rank1 <= top_25_threshold and rank2 <= top_25_threshold and
-                          row1['最高玩家累充金额'] >= 5000 and row2['最高玩家累充金额'] >= 5000)
-                          
-                power1 = row1['前2名战力之和']
-                power2 = row2['前2名战力之和']
-                cond_c = abs(power1 - power2) <= 1000000000
-                
-                if cond_a or cond_b or cond_c:
-                    reasons = []
-                    if cond_a: reasons.append(f"排名接近(差{abs(rank1-rank2)})")
-                    if cond_b: reasons.append("高战高充(前25%)")
-                    if cond_c: reasons.append("战力接近(差<=10亿)")
-                    reason_str = "; ".join(reasons)
-                    
-                    logger.user(f"发现警报：{s1} 和 {s2} - {reason_str}", 'WARN')
-                    alert_groups.append({'ids': [s1, s2], 'reason': reason_str})
-                else:
-                    normal_groups.append((s1, s2))
-            
-            logger.user(f"检测完成：发现 {len(alert_groups)} 组警报，{len(normal_groups)} 组正常")
-
-            # 4. Secondary Alert Check
-            logger.dev("加载 XLSX 进行二次关联检测")
-            wb = load_workbook(xlsx_path)
-            ws = wb.active
-            
-            header_row = [cell.value for cell in ws[1]]
-            try:
-                target_col_idx = header_row.index('目标服') 
-                part_col_idx = header_row.index('参与服')
-            except ValueError:
-                target_col_idx = 0
-                part_col_idx = 1
-
-            def find_partner_in_xlsx(server_id):
-                for r_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                    t_id = row[target_col_idx]
-                    p_id = row[part_col_idx]
-                    if t_id == server_id: return r_idx, p_id
-                    if p_id == server_id: return r_idx, t_id
-                return None, None
-
-            final_alert_rows = [] 
-            secondary_alert_groups = []
-            
-            for group in alert_groups:
-                group_id = f"Group_{group['ids'][0]}_{group['ids'][1]}"
-                for sid in group['ids']:
-                    r = get_server_info(df, sid)
-                    if r is not None:
-                        r_dict = r.to_dict()
-                        r_dict['警报组ID'] = group_id
-                        r_dict['警报原因'] = group['reason']
-                        
-                        # Force int type for ID fields in dict if they became float
-                        for k in ['区服ID', 'DAU', '跨服ID', 'code', '总注册角色', '峰值在线', '当天付费账号数']:
-                            if k in r_dict:
-                                try:
-                                    if isinstance(r_dict[k], float):
-                                        r_dict[k] = int(r_dict[k])
-                                    elif isinstance(r_dict[k], (int, float)): # Ensure even numpy ints are python ints
-                                         r_dict[k] = int(r_dict[k])
-                                except:
-                                    pass
-
-                        final_alert_rows.append(r_dict)
-                        
-                s1, s2 = group['ids'][0], group['ids'][1]
-                partners = []
-                _, p1 = find_partner_in_xlsx(s1)
-                if p1: partners.append(p1)
-                _, p2 = find_partner_in_xlsx(s2)
-                if p2: partners.append(p2)
-                
-                # Independent Secondary Checks
-                # Logic: For each server in the alerted pair (S1, S2), check their respective partners.
-                # If a Low DAU situation is found (either the server itself or its partner),
-                # create a NEW, INDEPENDENT alert group for that pair (Server + Partner).
-                
-                # Helper to process secondary pair
-                def process_secondary_pair(main_id, partner_id):
-                    if not partner_id:
-                        return
-
-                    main_row = get_server_info(df, main_id)
-                    partner_row = get_server_info(df, partner_id)
-                    
-                    # Check DAU conditions
-                    alerts = []
-                    if main_row is not None and main_row['DAU'] <= 5:
-                        alerts.append(f"{main_id}本身DAU过低({int(main_row['DAU'])})")
-                    if partner_row is not None and partner_row['DAU'] <= 5:
-                        alerts.append(f"关联服{partner_id}DAU过低({int(partner_row['DAU'])})")
-                        
-                    if alerts:
-                        # Create a unique group for this secondary relationship
-                        # Sort IDs to ensure consistent Group ID (e.g. Group_Small_Big)
-                        pair_ids = sorted([main_id, partner_id])
-                        sec_group_id = f"Group_{pair_ids[0]}_{pair_ids[1]}"
-                        reason_str = " | ".join(alerts)
-                        
-                        # Log it
-                        logger.user(f"触发独立二次警报: {sec_group_id} - {reason_str}", 'WARN')
-                        
-                        # Add to summary list for frontend
-                        secondary_alert_groups.append({
-                            'ids': pair_ids,
-                            'reason': reason_str
-                        })
-                        
-                        # Add rows to CSV data
-                        # 1. Add Main Server Row
-                        if main_row is not None:
-                            r_dict = main_row.to_dict()
-                            r_dict['警报组ID'] = sec_group_id
-                            r_dict['警报原因'] = reason_str
-                            # Force int type for ID fields in dict if they became float
-                            for k in ['区服ID', 'DAU', '跨服ID', 'code', '总注册角色', '峰值在线', '当天付费账号数']:
-                                if k in r_dict and isinstance(r_dict[k], float):
-                                    r_dict[k] = int(r_dict[k])
-                            final_alert_rows.append(r_dict)
-                            
-                        # 2. Add Partner Row
-                        if partner_row is not None:
-                            pr_dict = partner_row.to_dict()
-                            pr_dict['警报组ID'] = sec_group_id
-                            pr_dict['警报原因'] = reason_str
-                            # Force int type for ID fields in dict if they became float
-                            for k in ['区服ID', 'DAU', '跨服ID', 'code', '总注册角色', '峰值在线', '当天付费账号数']:
-                                if k in pr_dict and isinstance(pr_dict[k], float):
-                                    pr_dict[k] = int(pr_dict[k])
-                            final_alert_rows.append(pr_dict)
-
-                # Check S1 and its partner
-                _, p1 = find_partner_in_xlsx(s1)
-                process_secondary_pair(s1, p1)
-
-                # Check S2 and its partner
-                _, p2 = find_partner_in_xlsx(s2)
-                process_secondary_pair(s2, p2)
-
-            # Create Alert CSV with optimized formatting
-            if final_alert_rows:
-                alert_df = pd.DataFrame(final_alert_rows)
-                
-                # Define columns to keep
-                # Base cols from user requirement
-                base_cols_to_keep = [
-                    '区服ID', 'DAU', '近3日收入', '近7日收入', 
-                    '第一名战力', '第二名战力', '第三名战力', 
-                    '前2名战力之和', '前3名战力之和', 
-                    '前十平均战力', '前十平均等级', '最高玩家累充金额'
-                ]
-                # Added cols by logic
-                added_cols_to_keep = ['真实排名', '警报组ID', '警报原因']
-                
-                all_keep_cols = added_cols_to_keep + base_cols_to_keep
-                
-                # Filter columns: intersection of what we want and what exists
-                final_cols = [c for c in all_keep_cols if c in alert_df.columns]
-                
-                alert_df = alert_df[final_cols]
-                
-                # Add empty rows between groups for visual separation
-                # Convert to list of dicts to easily insert rows
-                # Sort by Group ID to ensure they are contiguous, and then by Real Rank
-                alert_df.sort_values(by=['警报组ID', '真实排名'], ascending=[True, True], inplace=True)
-                
-                output_rows = []
-                current_group = None
-                
-                for _, row in alert_df.iterrows():
-                    if current_group is not None and row['警报组ID'] != current_group:
-                        # Insert empty row (dict with all empty strings to prevent float promotion)
-                        empty_row = {c: "" for c in alert_df.columns}
-                        output_rows.append(empty_row)
-                    
-                    output_rows.append(row.to_dict())
-                    current_group = row['警报组ID']
-                
-                final_df = pd.DataFrame(output_rows)
-                output_csv_path = os.path.join(app.config['DOWNLOAD_FOLDER'], 'alert_result.csv')
-                final_df.to_csv(output_csv_path, index=False, encoding='utf-8-sig')
-            else:
-                pd.DataFrame().to_csv(os.path.join(app.config['DOWNLOAD_FOLDER'], 'alert_result.csv'), index=False)
-
-            # 5. Merge Servers (Merge Requests)
-            logger.user("正在处理正常组的合并申请...")
-            fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-            swapped_log_data = [] 
-
-            server_row_map = {}
-            for r_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                t_id = row[target_col_idx]
-                p_id = row[part_col_idx]
-                if t_id: server_row_map[t_id] = r_idx
-                if p_id: server_row_map[p_id] = r_idx
-                
-            actual_swapped_count = 0
-            
-            for s1, s2 in normal_groups:
-                r1_idx = server_row_map.get(s1)
-                r2_idx = server_row_map.get(s2)
-                
-                if r1_idx and r2_idx and r1_idx != r2_idx:
-                    actual_swapped_count += 1
-                    
-                    # Capture State Before Merge
-                    c1_t = ws.cell(row=r1_idx, column=target_col_idx+1)
-                    c1_p = ws.cell(row=r1_idx, column=part_col_idx+1)
-                    v1_t, v1_p = c1_t.value, c1_p.value
-                    
-                    c2_t = ws.cell(row=r2_idx, column=target_col_idx+1)
-                    c2_p = ws.cell(row=r2_idx, column=part_col_idx+1)
-                    v2_t, v2_p = c2_t.value, c2_p.value
-                    
-                    # Helper to format server pair string
-                    def fmt_pair(t, p):
-                        return f"[{t if t else '空'} + {p if p else '空'}]"
-
-                    before_str_1 = fmt_pair(v1_t, v1_p)
-                    before_str_2 = fmt_pair(v2_t, v2_p)
-
-                    # --- MERGE LOGIC ---
-                    # Goal: Put s1 and s2 into Row 1. Put their leftovers (partners) into Row 2.
-                    
-                    # 1. Identify partners (leftovers)
-                    # If v1_t is s1, then v1_p is the partner. And vice versa.
-                    p1 = v1_p if v1_t == s1 else v1_t
-                    p2 = v2_p if v2_t == s2 else v2_t
-                    
-                    # 2. Assign new pairs
-                    # Row 1 gets s1 and s2 (The requested pair)
-                    # Row 2 gets p1 and p2 (The leftover pair)
-                    
-                    # Sort pairs (Small ID first)
-                    new_pair_1 = sorted([x for x in [s1, s2] if x is not None])
-                    new_pair_2 = sorted([x for x in [p1, p2] if x is not None])
-                    
-                    # 3. Update Cells
-                    # Row 1
-                    if len(new_pair_1) == 2:
-                        c1_t.value, c1_p.value = new_pair_1[0], new_pair_1[1]
-                        final_v1_t, final_v1_p = new_pair_1[0], new_pair_1[1]
-                    elif len(new_pair_1) == 1:
-                         c1_t.value, c1_p.value = new_pair_1[0], None
-                         final_v1_t, final_v1_p = new_pair_1[0], None
-                    else:
-                         c1_t.value, c1_p.value = None, None # Should not happen for s1, s2
-                         final_v1_t, final_v1_p = None, None
-
-                    # Row 2
-                    if len(new_pair_2) == 2:
-                        c2_t.value, c2_p.value = new_pair_2[0], new_pair_2[1]
-                        final_v2_t, final_v2_p = new_pair_2[0], new_pair_2[1]
-                    elif len(new_pair_2) == 1:
-                         c2_t.value, c2_p.value = new_pair_2[0], None
-                         final_v2_t, final_v2_p = new_pair_2[0], None
-                    else:
-                         c2_t.value, c2_p.value = None, None
-                         final_v2_t, final_v2_p = None, None
-
-                    # Capture State After Swap
-                    after_str_1 = fmt_pair(final_v1_t, final_v1_p)
-                    after_str_2 = fmt_pair(final_v2_t, final_v2_p)
-                    
-                    # Human readable change log
-                    change_log = (
-                        f"组1 (行{r1_idx}): {before_str_1} ➔ {after_str_1} (合并目标)\n"
-                        f"   组2 (行{r2_idx}): {before_str_2} ➔ {after_str_2} (剩余自动组队)"
-                    )
-                    
-                    logger.user(f"✅ 成功合并 {s1} + {s2}\n   {change_log}", 'SUCCESS')
-                    
-                    swapped_log_data.append({
-                        '合并申请': f"{s1}+{s2}",
-                        '原始行号1': r1_idx, '原始行号2': r2_idx,
-                        'Before1': before_str_1, 'After1': after_str_1,
-                        'Before2': before_str_2, 'After2': after_str_2,
-                        '状态': '已合并'
-                    })
-                        
-                    for cell in ws[r1_idx]: cell.fill = fill
-                    for cell in ws[r2_idx]: cell.fill = fill
-
-                    # Update Map
-                    # Row 1 now contains s1 and s2
-                    if s1: server_row_map[s1] = r1_idx
-                    if s2: server_row_map[s2] = r1_idx
-                    # Row 2 now contains p1 and p2
-                    if p1: server_row_map[p1] = r2_idx
-                    if p2: server_row_map[p2] = r2_idx
-                    
-                    logger.dev(f"执行合并 ({s1}, {s2}) -> Row {r1_idx}, Leftovers ({p1}, {p2}) -> Row {r2_idx}")
-                else:
-                    logger.dev(f"无法合并 ({s1}, {s2}): 未找到匹配行或已在同一行")
-
-            if swapped_log_data:
-                swapped_df = pd.DataFrame(swapped_log_data)
-                output_swapped_path = os.path.join(app.config['DOWNLOAD_FOLDER'], 'swapped_log.csv')
-                swapped_df.to_csv(output_swapped_path, index=False, encoding='utf-8-sig')
-            else:
-                pd.DataFrame().to_csv(os.path.join(app.config['DOWNLOAD_FOLDER'], 'swapped_log.csv'), index=False)
-
-            output_xlsx_path = os.path.join(app.config['DOWNLOAD_FOLDER'], 'result_plan.xlsx')
-            wb.save(output_xlsx_path)
-            logger.user("所有任务处理完成！", 'SUCCESS')
-
-            return render_template('index.html', 
-                                   success=True, 
-                                   logs=logger.logs,
-                                   alert_csv='alert_result.csv', 
-                                   swapped_csv='swapped_log.csv',
-                                   result_xlsx='result_plan.xlsx',
-                                   alert_count=len(alert_groups),
-                                   secondary_alert_count=len(secondary_alert_groups),
-                                   swap_count=actual_swapped_count,
-                                   alert_preview=alert_groups, # Pass all for preview
-                                   secondary_alert_preview=secondary_alert_groups,
-                                   swap_preview=swapped_log_data) # Pass all for preview
-
-        except Exception as e:
-            traceback.print_exc()
-            return f"Error: {str(e)}", 500
+        # Form fallback: run as a job (bounded by the worker pool) and wait for it
+        job, error = start_job()
+        if error:
+            return error
+        job.future.result()
+        if job.status == 'failed':
+            if job.error_code == 400:
+                return job.error, 400
+            return f"Error: {job.error}", 500
+        return render_job(job)
 
     return render_template('index.html')
 
-@app.route('/download/<filename>')
-def download_file(filename):
-    return send_from_directory(app.config['DOWNLOAD_FOLDER'], filename, as_attachment=True)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    job, error = start_job()
+    if error:
+        return jsonify({'error': error[0]}), error[1]
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'view_url': url_for('job_view', job_id=job.id),
+        'events_url': url_for('job_events', job_id=job.id),
+    }), 202
+
+
+@app.route('/batches', methods=['POST'])
+def submit_batch():
+    # Several plans against one upload of server data: csv_files, xlsx_files (one per plan) and,
+    # in the same order, one pairs_text field or pairs_files file per plan (either may be omitted)
+    csv_files = request.files.getlist('csv_files')
+    xlsx_files = [f for f in request.files.getlist('xlsx_files') if f.filename != '']
+    pairs_files = request.files.getlist('pairs_files')
+    pairs_texts = request.form.getlist('pairs_text') or [f.read().decode('utf-8-sig') for f in pairs_files]
+    if not csv_files or not xlsx_files:
+        return jsonify({'error': 'Missing files'}), 400
+    if pairs_texts and len(pairs_texts) != len(xlsx_files):
+        return jsonify({'error': f'合服计划表 {len(xlsx_files)} 个，检测区服列表 {len(pairs_texts)} 个，数量不一致'}), 400
+    pairs_texts = pairs_texts or [''] * len(xlsx_files)
+    audit = bool(request.form.get('audit_plan'))
+    suggest = bool(request.form.get('suggest_pairs'))
+
+    job = job_manager.create()
+    job.logger.user("开始处理批量任务...")
+    job.logger.dev(f"初始化请求参数解析，任务ID: {job.id}")
+    plans = []
+    for i, (file, pairs_text) in enumerate(zip(xlsx_files, pairs_texts)):
+        xlsx_path = os.path.join(job.upload_dir, f'plan_{i}.xlsx')
+        file.save(xlsx_path)
+        plans.append((file.filename, xlsx_path, pairs_text))
+    job.logger.user(f"合服计划表 (XLSX) 上传成功，共 {len(plans)} 个")
+    csv_items = save_server_files(csv_files, job.upload_dir)
+
+    def task(job):
+        return run_batch(csv_items, plans, job.download_dir, job.logger, workers=app.config['INGEST_WORKERS'],
+                         cache=snapshot_cache, on_stage=job.set_stage, audit=audit, suggest=suggest,
+                         plan_workers=app.config['PLAN_WORKERS'])
+
+    job_manager.submit(job, task)
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'view_url': url_for('job_view', job_id=job.id),
+        'events_url': url_for('job_events', job_id=job.id),
+    }), 202
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    return jsonify(job.to_status(since=request.args.get('since', 0, type=int)))
+
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    # Server-Sent Events: 'log' per new log entry, 'status' on stage changes, then 'done' or
+    # 'failed'. Resumes after ?since=N or the Last-Event-ID the browser sends on reconnect.
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', 0, type=int)
+
+    def event(name, data, event_id=None):
+        head = f"id: {event_id}\n" if event_id is not None else ''
+        return f"{head}event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def stream():
+        sent = since
+        last_summary = None
+        last_write = time.monotonic()
+        while True:
+            finished = job.finished  # read before the logs so the final entries are included
+            logs = job.logger.logs
+            count = len(logs)
+            for i in range(sent, count):
+                yield event('log', logs[i], i + 1)
+            sent = max(sent, count)
+            summary = job.summary()
+            if summary != last_summary:
+                yield event('status', summary)
+                last_summary = summary
+                last_write = time.monotonic()
+            if finished:
+                if job.status == 'done':
+                    yield event('done', {'view_url': url_for('job_view', job_id=job.id)})
+                else:
+                    yield event('failed', {'error': job.error})
+                return
+            if time.monotonic() - last_write > SSE_KEEPALIVE_SECONDS:
+                yield ': keep-alive\n\n'
+                last_write = time.monotonic()
+            time.sleep(SSE_POLL_SECONDS)
+
+    # stream_with_context keeps url_for usable inside the generator
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/jobs/<job_id>/results/<kind>')
+def job_results(job_id, kind):
+    # One page of a result list: alerts, secondary_alerts, swaps, conflicts, overlaps or logs.
+    # Filters: ?reason= and ?group= (substring), ?q= (either); logs take ?category=, ?level=, ?q=
+    # Batch jobs take ?plan=N (1-based) for the per-plan lists
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', DEFAULT_PER_PAGE, type=int)
+    if kind == 'logs':
+        logs = filter_logs(job.logger.logs, request.args.get('category'), request.args.get('level'),
+                           request.args.get('q'))
+        return jsonify(paginate(logs, page, per_page))
+    if kind not in RESULT_LISTS:
+        abort(404)
+    if job.status != 'done':
+        return jsonify({'error': '任务尚未完成', 'status': job.status}), 409
+    plan = request.args.get('plan', type=int)
+    if job.is_batch and kind != 'overlaps':
+        if plan is None or not 1 <= plan <= len(job.result['plans']):
+            return jsonify({'error': f"批量任务需指定 plan (1-{len(job.result['plans'])})"}), 400
+        plan -= 1
+    else:
+        plan = None
+    items = filter_items(job.items(kind, plan), request.args.get('reason'), request.args.get('group'),
+                         request.args.get('q'))
+    return jsonify(paginate(items, page, per_page))
+
+
+@app.route('/jobs/<job_id>/view')
+def job_view(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+    if not job.finished:
+        return "任务尚未完成", 409
+    if job.status == 'failed':
+        return f"Error: {job.error}", job.error_code
+    if job.is_batch:
+        # No page for batches yet: per-plan summaries and download links as JSON
+        return jsonify(job.to_status())
+    return render_job(job)
+
+
+@app.route('/datasets', methods=['POST'])
+def create_dataset():
+    # Builds the ranked snapshot and plan index once; the uploads are not kept on disk
+    csv_files = request.files.getlist('csv_files')
+    xlsx_file = request.files.get('xlsx_file')
+    if not csv_files or not xlsx_file:
+        return jsonify({'error': 'Missing files'}), 400
+
+    logger = ExecutionLogger()
+    with tempfile.TemporaryDirectory() as workdir:
+        xlsx_path = os.path.join(workdir, 'input.xlsx')
+        xlsx_file.save(xlsx_path)
+        csv_items = save_server_files(csv_files, workdir)
+        try:
+            snapshot = load_snapshot(csv_items, logger, app.config['INGEST_WORKERS'], snapshot_cache)
+            plan = load_plan(xlsx_path, logger)
+        except PipelineError as e:
+            return jsonify({'error': str(e), 'logs': logger.logs}), 400
+
+    dataset = dataset_store.add(snapshot, plan)
+    info = dataset.info()
+    info['check_url'] = url_for('check_dataset_pairs', token=dataset.token)
+    info['logs'] = logger.logs
+    return jsonify(info), 201
+
+
+@app.route('/datasets/<token>', methods=['GET', 'DELETE'])
+def dataset_detail(token):
+    if request.method == 'DELETE':
+        if not dataset_store.remove(token):
+            return jsonify({'error': '数据集不存在或已过期'}), 404
+        return '', 204
+    dataset = dataset_store.get(token)
+    if dataset is None:
+        return jsonify({'error': '数据集不存在或已过期'}), 404
+    return jsonify(dataset.info())
+
+
+@app.route('/datasets/<token>/check', methods=['POST'])
+def check_dataset_pairs(token):
+    # Body: {"pairs": [[409474, 409370], ...]} or {"pairs_text": "409474, 409370\n..."},
+    # plus optional "dry_run_merge" and "include_logs" flags
+    dataset = dataset_store.get(token)
+    if dataset is None:
+        return jsonify({'error': '数据集不存在或已过期'}), 404
+
+    body = request.get_json(silent=True) or {}
+    pairs_text = body.get('pairs_text')
+    if pairs_text is None:
+        try:
+            pairs_text = '\n'.join(f"{int(s1)},{int(s2)}" for s1, s2 in body.get('pairs', []))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'pairs 必须是 [区服ID, 区服ID] 列表'}), 400
+
+    logger = ExecutionLogger()
+    input_pairs = parse_pairs(pairs_text, logger)
+    result = check_pairs(dataset.snapshot, dataset.plan, input_pairs, logger,
+                         dry_run_merge=bool(body.get('dry_run_merge')))
+    result['pair_count'] = len(input_pairs)
+    if body.get('include_logs'):
+        result['logs'] = logger.logs
+    return jsonify(result)
+
+
+@app.route('/datasets/<token>/append', methods=['POST'])
+def append_dataset_day(token):
+    # Folds new daily CSV(s) into the dataset's snapshot; ranks are updated in place and only
+    # plan rows touching changed servers are re-scored by the audit
+    dataset = dataset_store.get(token)
+    if dataset is None:
+        return jsonify({'error': '数据集不存在或已过期'}), 404
+    csv_files = [f for f in request.files.getlist('csv_files') if f.filename != '']
+    if not csv_files:
+        return jsonify({'error': 'Missing files'}), 400
+
+    logger = ExecutionLogger()
+    with dataset.lock, tempfile.TemporaryDirectory() as workdir:
+        # Every file is folded into a local snapshot first; the dataset (in memory and on
+        # disk) only changes once all of them have been read, so a bad file changes nothing
+        snapshot = dataset.snapshot
+        changed_servers = set()
+        for i, file in enumerate(csv_files):
+            temp_path = os.path.join(workdir, f'input_{i}{server_file_suffix(file.filename)}')
+            file.save(temp_path)
+            try:
+                snapshot, changed_ids = append_day(snapshot, (temp_path, file.filename), logger, snapshot_cache)
+            except PipelineError as e:
+                return jsonify({'error': str(e), 'logs': logger.logs}), 400
+            changed_servers.update(changed_ids.tolist())
+        with logger.span('audit') as span:
+            rescored = dataset.update_snapshot(snapshot, sorted(changed_servers))
+            span['pairs'] = rescored
+        dataset_store.save(dataset)
+        audit = dataset.plan_audit().stats()
+
+    info = dataset.info()
+    info.update({
+        'changed_servers': len(changed_servers),
+        'rescored_rows': rescored,
+        'audit': audit,
+        'seconds': logger.total_seconds(),
+        'logs': logger.logs,
+    })
+    return jsonify(info)
+
+
+@app.route('/datasets/<token>/audit')
+def audit_dataset_plan(token):
+    # Whole-plan audit of the dataset's plan; ?limit=N caps the returned rows (default 100)
+    dataset = dataset_store.get(token)
+    if dataset is None:
+        return jsonify({'error': '数据集不存在或已过期'}), 404
+    limit = request.args.get('limit', 100, type=int)
+    logger = ExecutionLogger()
+    with dataset.lock:
+        frame, stats = run_plan_audit(dataset.snapshot, dataset.plan, logger, dataset.plan_audit())
+    rows = frame.head(limit).astype(object).where(frame.head(limit).notna(), None)
+    return jsonify({**stats, 'rows': rows.to_dict('records')})
+
+
+@app.route('/datasets/<token>/suggest')
+def suggest_dataset_pairs(token):
+    # Proposed pairing of the plan's servers (?scope=all: every server in the data), returned
+    # as a plan XLSX that can be uploaded as is, or as JSON with ?format=json
+    dataset = dataset_store.get(token)
+    if dataset is None:
+        return jsonify({'error': '数据集不存在或已过期'}), 404
+    plan = None if request.args.get('scope') == 'all' else dataset.plan
+    logger = ExecutionLogger()
+    frame, stats = run_pair_suggestion(dataset.snapshot, logger, plan)
+    if request.args.get('format') == 'json':
+        rows = frame.astype(object).where(frame.notna(), None)
+        return jsonify({**stats, 'rows': rows.to_dict('records'), 'logs': logger.logs})
+    buffer = io.BytesIO()
+    write_suggestion_xlsx(frame, buffer)
+    buffer.seek(0)
+    return send_file(buffer, as_attachment=True, download_name='suggested_plan.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/download/<job_id>/<filename>')
+def download_file(job_id, filename):
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+    return send_from_directory(job.download_dir, filename, as_attachment=True)
 
 if __name__ == '__main__':
+    # Needed for the CSV process pool in the frozen (PyInstaller) Windows build
+    multiprocessing.freeze_support()
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from rules import LOW_DAU_LIMIT, _join_reasons, evaluate_primary_rules
+
+AUDIT_COLS = ['风险排名', '行号', '目标服', '参与服', '风险数', '风险原因', '排名差', '战力差',
+              '目标服排名', '参与服排名', '目标服DAU', '参与服DAU']
+
+
+def plan_pair_arrays(plan):
+    # (row numbers, targets, participants) for plan rows holding two numeric server IDs,
+    # plus the number of rows skipped because a side is empty or not an ID
+    rows = np.asarray(sorted(plan.rows), dtype=np.int64)
+    values = [plan.rows[r] for r in rows.tolist()]
+    targets = pd.to_numeric(pd.Series([v[0] for v in values], dtype=object), errors='coerce').to_numpy(dtype=float)
+    participants = pd.to_numeric(pd.Series([v[1] for v in values], dtype=object), errors='coerce').to_numpy(dtype=float)
+    valid = np.isfinite(targets) & np.isfinite(participants)
+    return (rows[valid], targets[valid].astype(np.int64), participants[valid].astype(np.int64),
+            int((~valid).sum()))
+
+
+def _int_column(values, mask):
+    # Nullable integer column, empty where mask is False
+    return pd.Series(values, dtype='Int64').where(mask)
+
+
+def _low_dau(snapshot, positions, found, ids):
+    dau = np.where(found, snapshot.dau[np.where(found, positions, 0)], 0)
+    low = found & (dau <= LOW_DAU_LIMIT)
+    # Reason text only for the (few) low rows
+    text = np.full(len(ids), '', dtype=object)
+    sel = np.flatnonzero(low)
+    text[sel] = [f"{sid}DAU过低({d})" for sid, d in zip(ids[sel].tolist(), dau[sel].tolist())]
+    return low, dau, text
+
+
+class PlanAudit:
+    """Verdicts for every complete 目标服/参与服 row of the plan, kept as per-row arrays.
+
+    refresh() re-scores only the rows that touch changed servers, so a snapshot updated with
+    one new day does not re-evaluate the whole plan.
+    """
+
+    def __init__(self, snapshot, plan):
+        self.plan_rows = len(plan.rows)
+        self.rows, self.left, self.right, self.incomplete = plan_pair_arrays(plan)
+        n = len(self.rows)
+        self.found1 = np.zeros(n, dtype=bool)
+        self.found2 = np.zeros(n, dtype=bool)
+        self.primary = np.zeros(n, dtype=bool)
+        self.low = np.zeros(n, dtype=bool)
+        self.hits = np.zeros(n, dtype=np.int64)
+        self.reasons = np.full(n, '', dtype=object)
+        self.rank_gap = np.zeros(n, dtype=np.int64)
+        self.power_gap = np.zeros(n, dtype=np.float64)
+        self.rank1 = np.zeros(n, dtype=np.int64)
+        self.rank2 = np.zeros(n, dtype=np.int64)
+        self.dau1 = np.zeros(n, dtype=np.int64)
+        self.dau2 = np.zeros(n, dtype=np.int64)
+        self.total_servers = snapshot.total_servers
+        self._score(snapshot, np.arange(n))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _score(self, snapshot, idx):
+        left, right = self.left[idx], self.right[idx]
+        primary = evaluate_primary_rules(snapshot, left, right)
+        pos1, pos2 = snapshot.positions(left), snapshot.positions(right)
+        low1, dau1, text1 = _low_dau(snapshot, pos1, primary.left_found, left)
+        low2, dau2, text2 = _low_dau(snapshot, pos2, primary.right_found, right)
+
+        self.found1[idx], self.found2[idx] = primary.left_found, primary.right_found
+        self.primary[idx] = primary.alert
+        self.low[idx] = low1 | low2
+        self.hits[idx] = primary.hits.astype(np.int64) + low1 + low2
+        self.reasons[idx] = _join_reasons([primary.reasons.astype(object), text1, text2], '; ')
+        self.rank_gap[idx], self.power_gap[idx] = primary.rank_gap, primary.power_gap
+        self.rank1[idx] = np.where(primary.left_found, snapshot.rank[np.where(primary.left_found, pos1, 0)], 0)
+        self.rank2[idx] = np.where(primary.right_found, snapshot.rank[np.where(primary.right_found, pos2, 0)], 0)
+        self.dau1[idx], self.dau2[idx] = dau1, dau2
+
+    def refresh(self, snapshot, changed_ids):
+        # Re-scores rows with a changed server; all rows if the server count (and with it
+        # the top-25% threshold) changed. Returns the number of rows re-scored.
+        if snapshot.total_servers != self.total_servers:
+            idx = np.arange(len(self.rows))
+            self.total_servers = snapshot.total_servers
+        else:
+            idx = np.flatnonzero(np.isin(self.left, changed_ids) | np.isin(self.right, changed_ids))
+        if len(idx):
+            self._score(snapshot, idx)
+        return len(idx)
+
+    def frame(self):
+        # Risky rows: most rules triggered first; closer ranks first within the same count; then plan order
+        risky = np.flatnonzero(self.hits > 0)
+        idx = risky[np.lexsort((self.rows[risky], self.rank_gap[risky], -self.hits[risky]))]
+        found1, found2 = self.found1[idx], self.found2[idx]
+        found = found1 & found2
+        return pd.DataFrame({
+            '风险排名': np.arange(1, len(idx) + 1),
+            '行号': self.rows[idx],
+            '目标服': self.left[idx],
+            '参与服': self.right[idx],
+            '风险数': self.hits[idx],
+            '风险原因': self.reasons[idx],
+            '排名差': _int_column(self.rank_gap[idx], found),
+            '战力差': pd.Series(self.power_gap[idx]).where(found),
+            '目标服排名': _int_column(self.rank1[idx], found1),
+            '参与服排名': _int_column(self.rank2[idx], found2),
+            '目标服DAU': _int_column(self.dau1[idx], found1),
+            '参与服DAU': _int_column(self.dau2[idx], found2),
+        }, columns=AUDIT_COLS)
+
+    def stats(self):
+        return {
+            'plan_rows': self.plan_rows,
+            'pairs': len(self.rows),
+            'incomplete_rows': self.incomplete,
+            'missing_rows': int((~(self.found1 & self.found2)).sum()),
+            'risky_rows': int((self.hits > 0).sum()),
+            'primary_rows': int(self.primary.sum()),
+            'low_dau_rows': int(self.low.sum()),
+        }
+
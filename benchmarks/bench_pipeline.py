@@ -0,0 +1,199 @@
+"""Stage timings and peak memory for the merge pipeline on synthetic data.
+
+Runs every stage (ingest, rank, primary, secondary, merge, write) for each scale in the
+sweep and prints wall time and tracemalloc peak per stage. Results can be saved as a named
+baseline and later runs compared against it:
+
+    python benchmarks/bench_pipeline.py --scales 1000,10000,100000 --save-baseline main
+    python benchmarks/bench_pipeline.py --scales 1000,10000,100000 --compare main
+
+--compare exits with status 1 when a stage is slower than the baseline by more than
+--tolerance (and by at least --min-delta seconds).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import iter_server_csvs, merge_server_maxima, rank_servers  # noqa: E402
+from pipeline import (ExecutionLogger, apply_merge_requests, check_primary,  # noqa: E402
+                      check_secondary, load_plan, parse_pairs)
+from plan import write_plan  # noqa: E402
+from report import AlertReport  # noqa: E402
+from snapshot import ServerSnapshot  # noqa: E402
+
+from synthetic import generate  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+STAGES = ['ingest', 'rank', 'primary', 'secondary', 'merge', 'write']
+
+
+class StageTimer:
+    def __init__(self, track_memory):
+        self.track_memory = track_memory
+        self.results = {}
+
+    def run(self, stage, fn, **counts):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        entry = {'seconds': round(elapsed, 4)}
+        if self.track_memory:
+            entry['peak_mb'] = round((tracemalloc.get_traced_memory()[1] - base) / 1e6, 2)
+        entry.update(counts)
+        self.results[stage] = entry
+        return value
+
+
+def run_scale(servers, days, pairs, workers, track_memory, keep_dir=None):
+    data_dir = keep_dir or tempfile.mkdtemp(prefix=f'merge_bench_{servers}_')
+    out_dir = os.path.join(data_dir, 'out')
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        csv_paths, xlsx_path, pairs_text = generate(data_dir, servers, days, pairs)
+        logger = ExecutionLogger()
+        timer = StageTimer(track_memory)
+
+        def ingest():
+            acc, rows = None, 0
+            for _, part, n, error, _ in iter_server_csvs(csv_paths, workers):
+                if error is not None:
+                    raise RuntimeError(error)
+                acc = merge_server_maxima(acc, part)
+                rows += n
+            return acc, rows
+
+        (servers_df, rows) = timer.run('ingest', ingest, files=len(csv_paths))
+        timer.results['ingest']['rows'] = rows
+
+        snapshot = timer.run('rank', lambda: ServerSnapshot(rank_servers(servers_df)), servers=len(servers_df))
+
+        input_pairs = parse_pairs(pairs_text, logger)
+        alert_groups, normal_groups = timer.run(
+            'primary', lambda: check_primary(snapshot, input_pairs, logger), pairs=len(input_pairs))
+
+        report = AlertReport(snapshot)
+
+        def secondary():
+            plan = load_plan(xlsx_path, logger)
+            return plan, check_secondary(snapshot, plan, alert_groups, logger, report)
+
+        plan, secondary_groups = timer.run('secondary', secondary, alert_groups=len(alert_groups))
+        timer.results['secondary']['secondary_groups'] = len(secondary_groups)
+
+        swapped, conflicts = timer.run('merge', lambda: apply_merge_requests(plan, normal_groups, logger),
+                                       requests=len(normal_groups))
+        timer.results['merge']['merged'] = len(swapped)
+        timer.results['merge']['conflicts'] = len(conflicts)
+
+        def write():
+            report.write_csv(os.path.join(out_dir, 'alert_result.csv'))
+            pd.DataFrame(swapped).to_csv(os.path.join(out_dir, 'swapped_log.csv'), index=False, encoding='utf-8-sig')
+            write_plan(xlsx_path, os.path.join(out_dir, 'result_plan.xlsx'), plan)
+
+        timer.run('write', write, report_rows=len(report), changed_rows=len(plan.changed_rows))
+        return timer.results
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def print_table(results):
+    print(f"{'servers':>8}  {'stage':<10} {'seconds':>9} {'peak MB':>9}  counts")
+    for scale, stages in results.items():
+        for stage in STAGES:
+            entry = stages.get(stage)
+            if entry is None:
+                continue
+            counts = ', '.join(f"{k}={v}" for k, v in entry.items() if k not in ('seconds', 'peak_mb'))
+            peak = entry.get('peak_mb', '-')
+            print(f"{scale:>8}  {stage:<10} {entry['seconds']:>9.4f} {peak:>9}  {counts}")
+
+
+def compare(results, baseline, tolerance, min_delta):
+    # Returns a list of regression messages
+    regressions = []
+    for scale, stages in results.items():
+        base_stages = baseline['results'].get(str(scale), {})
+        for stage, entry in stages.items():
+            base = base_stages.get(stage)
+            if base is None:
+                continue
+            delta = entry['seconds'] - base['seconds']
+            if entry['seconds'] > base['seconds'] * (1 + tolerance) and delta > min_delta:
+                regressions.append(f"{scale} servers / {stage}: {base['seconds']:.4f}s -> {entry['seconds']:.4f}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the merge pipeline stages on synthetic data')
+    parser.add_argument('--scales', default='1000,10000,100000', help='comma-separated server counts')
+    parser.add_argument('--days', type=int, default=7, help='daily CSVs per scale')
+    parser.add_argument('--pairs', type=int, default=None, help='pair lines per scale (default servers/10)')
+    parser.add_argument('--workers', type=int, default=1, help='CSV parse processes (memory is only tracked in-process)')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc (lower overhead)')
+    parser.add_argument('--keep-data', metavar='DIR', help='generate inputs under DIR and keep them')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON')
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown ratio')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='ignore slowdowns below this many seconds')
+    args = parser.parse_args(argv)
+
+    track_memory = not args.no_memory
+    if track_memory:
+        tracemalloc.start()
+
+    results = {}
+    for scale in [int(s) for s in args.scales.split(',') if s.strip()]:
+        keep_dir = os.path.join(args.keep_data, str(scale)) if args.keep_data else None
+        results[scale] = run_scale(scale, args.days, args.pairs, args.workers, track_memory, keep_dir)
+    print_table(results)
+
+    payload = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'days': args.days,
+            'workers': args.workers,
+        },
+        'results': {str(k): v for k, v in results.items()},
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save_baseline}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"baseline saved: {path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json'), encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions against baseline '{args.compare}'")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
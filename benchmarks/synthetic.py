@@ -0,0 +1,132 @@
+"""Synthetic inputs in the shape of the real exports.
+
+Produces D daily server CSVs (column-index line + Chinese header, i.e. the header=1 layout),
+a merge plan XLSX with 目标服/参与服 columns and a pairs text with duplicates, reversed
+pairs, unknown IDs and full-width commas mixed in.
+
+    python benchmarks/synthetic.py OUT_DIR --servers 10000 --days 7
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+FIRST_SERVER_ID = 400000
+
+CSV_COLUMNS = [
+    '区服ID', '跨服ID', 'code', 'DAU', '有效DAU', '当天付费账号数', '峰值在线',
+    'MAC_DAU', 'IP_DAU', '账号DAU', '总注册角色', '近3日收入', '近7日收入',
+    '第一名战力', '第二名战力', '第三名战力', '前2名战力之和', '前3名战力之和',
+    '前十平均战力', '前十平均等级', '最高玩家累充金额', '开服时间', '备注',
+]
+
+
+def server_ids(servers):
+    return np.arange(FIRST_SERVER_ID, FIRST_SERVER_ID + servers, dtype=np.int64)
+
+
+def daily_frame(ids, rng):
+    n = len(ids)
+    first = rng.uniform(1e8, 2e10, n).round()
+    second = first * rng.uniform(0.5, 1.0, n)
+    third = second * rng.uniform(0.8, 1.0, n)
+    return pd.DataFrame({
+        '区服ID': ids,
+        '跨服ID': ids // 8,
+        'code': ids % 97,
+        'DAU': rng.integers(0, 60, n),
+        '有效DAU': rng.integers(0, 50, n),
+        '当天付费账号数': rng.integers(0, 10, n),
+        '峰值在线': rng.integers(0, 120, n),
+        'MAC_DAU': rng.integers(0, 60, n),
+        'IP_DAU': rng.integers(0, 60, n),
+        '账号DAU': rng.integers(0, 60, n),
+        '总注册角色': rng.integers(100, 20000, n),
+        '近3日收入': rng.uniform(0, 1e4, n).round(2),
+        '近7日收入': rng.uniform(0, 3e4, n).round(2),
+        '第一名战力': first,
+        '第二名战力': second,
+        '第三名战力': third,
+        '前2名战力之和': first + second,
+        '前3名战力之和': first + second + third,
+        '前十平均战力': third * 0.7,
+        '前十平均等级': rng.integers(100, 400, n),
+        '最高玩家累充金额': rng.integers(0, 30000, n),
+        '开服时间': '2026-01-01',
+        '备注': '',
+    }, columns=CSV_COLUMNS).sample(frac=1.0, random_state=int(rng.integers(1 << 31)))
+
+
+def write_daily_csv(path, frame):
+    # First line is a column index, the real header is on line 2
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(str(i) for i in range(len(frame.columns))) + '\n')
+        frame.to_csv(f, index=False)
+
+
+def write_plan(path, ids, rng):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('合服计划')
+    ws.append(['目标服', '参与服', '合服时间'])
+    shuffled = rng.permutation(ids)
+    for i in range(0, len(shuffled) - 1, 2):
+        a, b = sorted((int(shuffled[i]), int(shuffled[i + 1])))
+        ws.append([a, b, '2026-11-01'])
+    wb.save(path)
+
+
+def pair_lines(ids, pairs, rng):
+    n = len(ids)
+    lines = []
+    # Mostly random pairs, plus neighbours in ID order so some land close in rank/power
+    random_count = int(pairs * 0.8)
+    left = rng.integers(0, n, random_count)
+    right = rng.integers(0, n, random_count)
+    for a, b in zip(ids[left], ids[right]):
+        if a != b:
+            lines.append(f"{a},{b}")
+    near = rng.integers(0, n - 1, pairs - random_count)
+    for i in near:
+        lines.append(f"{ids[i]}, {ids[i + 1]}")
+
+    extra = max(1, pairs // 20)
+    picks = rng.integers(0, len(lines), extra)
+    lines += [lines[i] for i in picks]                                      # duplicates
+    lines += [','.join(reversed(lines[i].split(','))) for i in picks]        # reversed duplicates
+    lines += [f"{ids[i]}，{FIRST_SERVER_ID - 1 - i}" for i in picks[:extra // 2 + 1]]  # unknown IDs
+    order = rng.permutation(len(lines))
+    return [lines[i] for i in order]
+
+
+def generate(out_dir, servers, days, pairs=None, seed=0):
+    # Returns (csv_paths, xlsx_path, pairs_text)
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    ids = server_ids(servers)
+
+    csv_paths = []
+    for day in range(days):
+        path = os.path.join(out_dir, f'server_data_day{day + 1:02d}.csv')
+        write_daily_csv(path, daily_frame(ids, rng))
+        csv_paths.append(path)
+
+    xlsx_path = os.path.join(out_dir, 'merge_plan.xlsx')
+    write_plan(xlsx_path, ids, rng)
+
+    pairs_text = '\n'.join(pair_lines(ids, pairs or max(10, servers // 10), rng))
+    with open(os.path.join(out_dir, 'pairs.txt'), 'w', encoding='utf-8') as f:
+        f.write(pairs_text)
+    return csv_paths, xlsx_path, pairs_text
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic merge-tool inputs')
+    parser.add_argument('out_dir')
+    parser.add_argument('--servers', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--pairs', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.out_dir, args.servers, args.days, args.pairs, args.seed)
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+
+def write_frame_npz(path, frame, **extra):
+    # One array per column plus any extra named arrays; written to a temp name first so
+    # readers never see a half-written file
+    arrays = {f'c{i}': frame[c].to_numpy() for i, c in enumerate(frame.columns)}
+    arrays['__columns__'] = np.array(list(frame.columns), dtype=str)
+    for name, value in extra.items():
+        arrays[f'__{name}__'] = np.asarray(value)
+    folder, name = os.path.split(path)
+    tmp = os.path.join(folder, f'.{name}.{uuid.uuid4().hex}.tmp.npz')
+    try:
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+    except OSError:
+        # e.g. on Windows, replacing a file another reader has open; do not leave the temp file
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def read_frame_npz(path):
+    # Returns (frame, extras) with the extra arrays keyed by their names
+    with np.load(path, allow_pickle=True) as data:
+        columns = data['__columns__'].tolist()
+        frame = pd.DataFrame({c: data[f'c{i}'] for i, c in enumerate(columns)}, columns=columns)
+        extras = {key[2:-2]: data[key] for key in data.files
+                  if key.startswith('__') and key != '__columns__'}
+    return frame, extras
+
+
+class SnapshotCache:
+    """On-disk cache of per-server reduced CSV frames, keyed by a hash of the file content.
+
+    Entries are NumPy .npz files (one array per column). Least recently used entries are
+    evicted once the folder grows beyond max_bytes.
+    """
+
+    def __init__(self, folder, max_bytes, schema_tag=''):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        # Mixed into every key so a change to the ingest schema invalidates old entries
+        self.schema_tag = schema_tag
+        os.makedirs(folder, exist_ok=True)
+
+    def key_for(self, path):
+        # None if the file cannot be read; the parser reports that error for the file itself
+        h = hashlib.sha256(self.schema_tag.encode('utf-8'))
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+        except OSError:
+            return None
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, f'{key}.npz')
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        # Returns (frame, rows) or None
+        path = self._path(key)
+        try:
+            frame, extras = read_frame_npz(path)
+            rows = int(extras['rows'])
+        except (OSError, KeyError, ValueError):
+            return None
+        # mtime doubles as the LRU timestamp; the entry may already have been evicted by
+        # another job, which does not matter once it is read
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return frame, rows
+
+    def put(self, key, frame, rows):
+        # Cache I/O never fails a run: a store that cannot be written (disk full, entry held
+        # open by another job on Windows) is simply skipped
+        try:
+            write_frame_npz(self._path(key), frame, rows=np.int64(rows))
+        except OSError:
+            return False
+        self.evict()
+        return True
+
+    def evict(self):
+        entries = []
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith('.npz') or name.startswith('.'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.folder, name))
+                total -= size
+            except OSError:
+                pass
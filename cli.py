@@ -0,0 +1,108 @@
+"""Runs the merge check on local files without the web server.
+
+    python cli.py --plan plan.xlsx --pairs pairs.txt --out results/ data/day1.csv data/day2.csv
+    python cli.py --plan plan.xlsx --pairs pairs.txt --out results/ data/   # every CSV in data/
+    python cli.py --plan east.xlsx --pairs east.txt --plan west.xlsx --pairs west.txt --out results/ data/
+
+Writes the same output files as the web page into --out and prints a JSON summary (counts,
+output paths, per-stage timings) on stdout. Exit status is 0 on success, 2 for bad input
+and 1 for any other failure.
+
+With several --plan options the data is parsed once and the plans are checked concurrently,
+each --pairs going with the --plan in the same position; outputs are prefixed per plan and
+cross_plan_summary.csv lists servers scheduled in more than one plan.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+# Result keys left out of the summary unless --lists is given (they can be long)
+LIST_KEYS = ['alert_preview', 'secondary_alert_preview', 'swap_preview', 'merge_conflicts', 'plan_overlaps']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="合服检测命令行工具")
+    parser.add_argument('csv', nargs='+', help="服务器数据 CSV 文件或包含 CSV 的目录")
+    parser.add_argument('--plan', action='append', required=True, help="合服计划表 (XLSX)，可多次指定")
+    parser.add_argument('--pairs', action='append', default=[],
+                        help="检测区服对文件，每行一对 (A,B)；'-' 从标准输入读取。多个计划时按顺序对应")
+    parser.add_argument('--out', default='.', help="输出目录 (默认当前目录)")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help="CSV 解析进程数 (数据量较小时自动串行)")
+    parser.add_argument('--plan-workers', type=int, default=4, help="多个计划时同时处理的计划数")
+    parser.add_argument('--cache-dir', help="CSV 解析缓存目录 (默认不缓存)")
+    parser.add_argument('--cache-max-mb', type=int, default=512, help="缓存大小上限 (MB)")
+    parser.add_argument('--audit', action='store_true', help="同时输出全表审计 plan_audit.csv")
+    parser.add_argument('--suggest', action='store_true', help="同时输出配对建议 suggested_plan.xlsx")
+    parser.add_argument('--lists', action='store_true', help="摘要中包含警报/合并/冲突明细")
+    parser.add_argument('--verbose', '-v', action='count', default=0,
+                        help="日志输出到 stderr (-v 用户日志，-vv 含开发日志)")
+    args = parser.parse_args(argv)
+    if args.pairs and len(args.pairs) != len(args.plan):
+        parser.error(f"--plan 指定了 {len(args.plan)} 次，--pairs 指定了 {len(args.pairs)} 次，数量需一致")
+    return args
+
+
+def read_pairs(path):
+    if not path:
+        return ''
+    if path == '-':
+        return sys.stdin.read()
+    with open(path, encoding='utf-8-sig') as f:
+        return f.read()
+
+
+def summarize(result, include_lists=False):
+    summary = {k: v for k, v in result.items() if include_lists or k not in LIST_KEYS}
+    if 'plans' in summary:
+        summary['plans'] = [summarize(plan, include_lists) for plan in summary['plans']]
+    return summary
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Pipeline modules (pandas) are imported only once the arguments are valid
+    from cache import SnapshotCache
+    from ingest import SCHEMA_TAG
+    from pipeline import ExecutionLogger, PipelineError, run_batch_files, run_files
+
+    cache = None
+    if args.cache_dir:
+        cache = SnapshotCache(args.cache_dir, args.cache_max_mb * 1024 * 1024, SCHEMA_TAG)
+
+    logger = ExecutionLogger()
+    start = time.perf_counter()
+    try:
+        pairs_texts = [read_pairs(path) for path in args.pairs] or [''] * len(args.plan)
+        if len(args.plan) == 1:
+            result, _ = run_files(args.csv, args.plan[0], pairs_texts[0], args.out, logger, workers=args.workers,
+                                  cache=cache, audit=args.audit, suggest=args.suggest)
+        else:
+            result, _ = run_batch_files(args.csv, list(zip(args.plan, pairs_texts)), args.out, logger,
+                                        workers=args.workers, cache=cache, audit=args.audit,
+                                        suggest=args.suggest, plan_workers=args.plan_workers)
+        status = 0
+    except (PipelineError, OSError) as e:
+        result, status = {'error': str(e)}, 2
+    except Exception as e:
+        result, status = {'error': f"{type(e).__name__}: {e}"}, 1
+
+    if args.verbose:
+        for log in logger.logs:
+            if log['category'] == 'user' or args.verbose > 1:
+                print(f"{log['time']} [{log['level']}] {log['msg']}", file=sys.stderr)
+
+    summary = result if status else summarize(result, args.lists)
+    summary['total_seconds'] = round(time.perf_counter() - start, 4)
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
+    return status
+
+
+if __name__ == '__main__':
+    # Needed for the CSV process pool in the frozen (PyInstaller) Windows build
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from audit import PlanAudit
+from cache import read_frame_npz, write_frame_npz
+from plan import PlanIndex
+from snapshot import ServerSnapshot
+
+# Rough per-row cost of the plan index (two dict entries plus a tuple)
+PLAN_ROW_BYTES = 300
+
+
+class Dataset:
+    """A ranked server snapshot and plan index kept in memory for repeated pair checks."""
+
+    def __init__(self, token, snapshot, plan):
+        self.token = token
+        self.snapshot = snapshot
+        self.plan = plan
+        self.audit = None
+        self.nbytes = int(snapshot.frame.memory_usage(deep=True).sum()) + len(plan.rows) * PLAN_ROW_BYTES
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        # Serialises snapshot updates; readers just use whichever snapshot is current
+        self.lock = threading.Lock()
+
+    def plan_audit(self):
+        # Whole-plan audit, built on first use and kept current by update_snapshot()
+        if self.audit is None:
+            self.audit = PlanAudit(self.snapshot, self.plan)
+        return self.audit
+
+    def update_snapshot(self, snapshot, changed_ids):
+        # Returns the number of plan rows re-scored (0 if the audit was never built)
+        self.snapshot = snapshot
+        self.nbytes = int(snapshot.frame.memory_usage(deep=True).sum()) + len(self.plan.rows) * PLAN_ROW_BYTES
+        if self.audit is None:
+            return 0
+        return self.audit.refresh(snapshot, changed_ids)
+
+    def info(self):
+        return {
+            'token': self.token,
+            'servers': len(self.snapshot),
+            'plan_rows': len(self.plan.rows),
+            'bytes': self.nbytes,
+        }
+
+
+class DatasetStore:
+    """In-memory datasets, evicted after idle_seconds without use or LRU beyond max_bytes.
+
+    With a folder, every dataset is also saved to disk (snapshot in rank order plus the plan
+    rows) and reloaded on demand after eviction or a restart; files are removed after
+    retention_seconds without an update.
+    """
+
+    def __init__(self, max_bytes, idle_seconds, folder=None, retention_seconds=7 * 24 * 3600):
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.folder = folder
+        self.retention_seconds = retention_seconds
+        self._datasets = OrderedDict()  # token -> Dataset, least recently used first
+        self._lock = threading.Lock()
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    def add(self, snapshot, plan):
+        dataset = Dataset(uuid.uuid4().hex, snapshot, plan)
+        self.save(dataset)
+        with self._lock:
+            self._datasets[dataset.token] = dataset
+            self._evict()
+        return dataset
+
+    def get(self, token):
+        with self._lock:
+            self._evict()
+            dataset = self._datasets.get(token)
+            if dataset is None:
+                dataset = self._load(token)
+                if dataset is not None:
+                    self._datasets[token] = dataset
+            if dataset is not None:
+                dataset.last_used = time.time()
+                self._datasets.move_to_end(token)
+            return dataset
+
+    def remove(self, token):
+        path = self._path(token)
+        removed_file = False
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+            removed_file = True
+        with self._lock:
+            return self._datasets.pop(token, None) is not None or removed_file
+
+    def _path(self, token):
+        # Tokens are uuid4 hex; anything else never maps to a file
+        if not self.folder or len(token) != 32 or not all(c in '0123456789abcdef' for c in token):
+            return None
+        return os.path.join(self.folder, f'{token}.npz')
+
+    def save(self, dataset):
+        path = self._path(dataset.token)
+        if path is None:
+            return
+        plan = dataset.plan
+        rows = sorted(plan.rows)
+        write_frame_npz(path, dataset.snapshot.frame,
+                        total=np.int64(dataset.snapshot.total_servers),
+                        plan_cols=np.array([plan.target_col_idx, plan.part_col_idx], dtype=np.int64),
+                        plan_rows=np.array(rows, dtype=np.int64),
+                        plan_targets=np.array([plan.rows[r][0] for r in rows], dtype=object),
+                        plan_parts=np.array([plan.rows[r][1] for r in rows], dtype=object))
+        self._expire_files()
+
+    def _load(self, token):
+        path = self._path(token)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            frame, extras = read_frame_npz(path)
+        except (OSError, KeyError, ValueError):
+            return None
+        plan = PlanIndex(*extras['plan_cols'].tolist())
+        for r_idx, target, participant in zip(extras['plan_rows'].tolist(), extras['plan_targets'].tolist(),
+                                              extras['plan_parts'].tolist()):
+            plan.add_row(r_idx, target, participant)
+        return Dataset(token, ServerSnapshot(frame, int(extras['total'])), plan)
+
+    def _expire_files(self):
+        now = time.time()
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            try:
+                if name.endswith('.npz') and now - os.path.getmtime(path) > self.retention_seconds:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        now = time.time()
+        for token in [t for t, d in self._datasets.items() if now - d.last_used > self.idle_seconds]:
+            del self._datasets[token]
+        total = sum(d.nbytes for d in self._datasets.values())
+        # Always keep the most recent dataset, even if it alone exceeds the budget
+        while total > self.max_bytes and len(self._datasets) > 1:
+            _, dataset = self._datasets.popitem(last=False)
+            total -= dataset.nbytes
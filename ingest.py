@@ -0,0 +1,291 @@
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+POWER_COL = '前2名战力之和'
+
+# Columns the pipeline computes on, with the compact dtype each is stored as
+# (None: numeric, dtype inferred so integral amounts stay integers in the report)
+COLUMN_DTYPES = {
+    '区服ID': np.int32,
+    '跨服ID': np.int32,
+    'code': np.int32,
+    'DAU': np.int32,
+    '有效DAU': np.int32,
+    '当天付费账号数': np.int32,
+    '峰值在线': np.int32,
+    'MAC_DAU': np.int32,
+    'IP_DAU': np.int32,
+    '账号DAU': np.int32,
+    '总注册角色': np.int32,
+    '前2名战力之和': np.float64,
+    '最高玩家累充金额': None,
+}
+
+# Source columns carried through to alert_result.csv
+REPORT_COLS = [
+    '区服ID', 'DAU', '近3日收入', '近7日收入',
+    '第一名战力', '第二名战力', '第三名战力',
+    '前2名战力之和', '前3名战力之和',
+    '前十平均战力', '前十平均等级', '最高玩家累充金额'
+]
+
+USED_COLS = list(COLUMN_DTYPES) + [c for c in REPORT_COLS if c not in COLUMN_DTYPES]
+
+# Identifies the reduced-frame layout; cached frames from another layout are not reused
+SCHEMA_TAG = repr(sorted((c, getattr(t, '__name__', None)) for c, t in COLUMN_DTYPES.items())) + repr(USED_COLS)
+
+# Accepted server data files. CSV exports (plain, or gzip as .csv.gz or a bare .gz) have the
+# column index on line 1 and the header on line 2; Parquet/Feather carry the header in their
+# schema; a zip holds daily CSV exports.
+CSV_EXTENSIONS = ('.csv', '.csv.gz', '.gz')
+COLUMNAR_EXTENSIONS = ('.parquet', '.pq', '.feather', '.arrow')
+ZIP_EXTENSIONS = ('.zip',)
+SERVER_FILE_EXTENSIONS = CSV_EXTENSIONS + COLUMNAR_EXTENSIONS + ZIP_EXTENSIONS
+
+# Rows per chunk when streaming a CSV; each chunk is reduced before the next is read
+CHUNK_ROWS = 200000
+
+# Below this much input (bytes on disk, over all files to parse) starting worker processes
+# costs more than parsing serially
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+
+def _as_int(values, dtype):
+    # Fall back to int64 rather than silently wrapping values that do not fit
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        dtype = np.int64
+    return values.astype(dtype)
+
+
+def coerce_types(df):
+    for col, dtype in COLUMN_DTYPES.items():
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            if dtype is None:
+                df[col] = values
+            elif np.issubdtype(dtype, np.integer):
+                df[col] = _as_int(values, dtype)
+            else:
+                df[col] = values.astype(dtype)
+    return df
+
+
+def reduce_per_server(df):
+    # Keep the max-前2名战力之和 row for every 区服ID
+    return (df.sort_values(by=POWER_COL, ascending=False, kind='stable')
+              .drop_duplicates(subset='区服ID', keep='first'))
+
+
+def merge_server_maxima(acc, part):
+    if acc is None:
+        return part
+    return reduce_per_server(pd.concat([acc, part], ignore_index=True))
+
+
+def server_file_suffix(filename, default='.csv'):
+    # Extension (one of SERVER_FILE_EXTENSIONS) that decides how a file is read; uploads are
+    # saved under it so the format survives the rename
+    name = filename.lower()
+    return next((ext for ext in SERVER_FILE_EXTENSIONS if name.endswith(ext)), default)
+
+
+def find_server_files(paths):
+    # Expands directories into their server data files (sorted by name, not recursive);
+    # plain file paths are kept as given, in order, without duplicates
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(n for n in os.listdir(path) if n.lower().endswith(SERVER_FILE_EXTENSIONS))
+            found.extend(os.path.join(path, n) for n in names)
+        else:
+            found.append(path)
+    return list(dict.fromkeys(found))
+
+
+def _fold_chunks(chunks):
+    # Typed, per-server reduced fold over raw chunks; returns (frame or None, rows)
+    acc = None
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        acc = merge_server_maxima(acc, reduce_per_server(coerce_types(chunk)))
+    return acc, rows
+
+
+def _read_csv(source, **kwargs):
+    return pd.read_csv(source, header=1, usecols=lambda c: c in USED_COLS, **kwargs)
+
+
+def read_server_csv(path, chunksize=CHUNK_ROWS):
+    # Returns (per-server max frame, number of raw rows read).
+    # The first line of the export is a column index, the real header is on line 2.
+    # .csv.gz and .gz are decompressed on the fly (compression is inferred from the name).
+    acc, rows = _fold_chunks(_read_csv(path, chunksize=chunksize))
+    if acc is None:
+        acc = coerce_types(_read_csv(path, nrows=0))
+    return acc.reset_index(drop=True), rows
+
+
+def read_server_zip(path, chunksize=CHUNK_ROWS):
+    # Daily CSV exports inside one zip, streamed member by member (in name order) straight
+    # from the archive and folded exactly as if they had been uploaded as separate files
+    with zipfile.ZipFile(path) as archive:
+        members = sorted(info.filename for info in archive.infolist()
+                         if not info.is_dir() and info.filename.lower().endswith('.csv')
+                         and not info.filename.startswith('__MACOSX/'))
+        if not members:
+            raise ValueError("压缩包中没有 CSV 文件")
+        acc = None
+        rows = 0
+        for name in members:
+            with archive.open(name) as f:
+                part, n = _fold_chunks(_read_csv(f, chunksize=chunksize))
+            rows += n
+            if part is not None:
+                acc = merge_server_maxima(acc, part)
+        if acc is None:
+            with archive.open(members[0]) as f:
+                acc = coerce_types(_read_csv(f, nrows=0))
+    return acc.reset_index(drop=True), rows
+
+
+def read_server_columnar(path, chunksize=CHUNK_ROWS):
+    # Parquet / Feather (Arrow IPC): only the used columns are read, in record batches of
+    # chunksize rows. pyarrow is optional and only needed for these files.
+    try:
+        import pyarrow.feather as feather
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("读取 Parquet/Feather 文件需要安装 pyarrow") from None
+
+    if path.lower().endswith(('.parquet', '.pq')):
+        source = pq.ParquetFile(path)
+        columns = [c for c in source.schema_arrow.names if c in USED_COLS]
+        batches = source.iter_batches(batch_size=chunksize, columns=columns)
+    else:
+        with ipc.open_file(path) as reader:
+            columns = [c for c in reader.schema.names if c in USED_COLS]
+        batches = feather.read_table(path, columns=columns, memory_map=True).to_batches(max_chunksize=chunksize)
+    acc, rows = _fold_chunks(batch.to_pandas() for batch in batches)
+    if acc is None:
+        acc = coerce_types(pd.DataFrame(columns=columns))
+    return acc.reset_index(drop=True), rows
+
+
+def read_server_file(path, chunksize=CHUNK_ROWS):
+    # Any accepted server data file -> (per-server max frame, raw rows); unknown extensions
+    # are read as CSV
+    suffix = server_file_suffix(path)
+    if suffix in COLUMNAR_EXTENSIONS:
+        return read_server_columnar(path, chunksize)
+    if suffix in ZIP_EXTENSIONS:
+        return read_server_zip(path, chunksize)
+    return read_server_csv(path, chunksize)
+
+
+def _read_one(path):
+    # Pool worker: errors are returned as text so they can be logged per file by the caller
+    try:
+        part, rows = read_server_file(path)
+        return part, rows, None
+    except Exception as e:
+        return None, 0, str(e)
+
+
+# One process pool per process, created on first use and reused by every later run. Workers
+# are started with 'spawn' (on Linux too) so they are never forked from a multi-threaded
+# server; the pool is sized by the first caller.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool(pool):
+    # Drops a broken pool (a worker died) so the next run starts a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def use_process_pool(paths, workers):
+    # Parallel parsing only pays off for several files with enough data between them
+    if workers <= 1 or len(paths) <= 1:
+        return False
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total >= PARALLEL_MIN_BYTES
+
+
+def _parse_all(paths, workers):
+    if not use_process_pool(paths, workers):
+        for path in paths:
+            yield _read_one(path)
+        return
+    pool = _get_pool(workers)
+    try:
+        futures = [pool.submit(_read_one, path) for path in paths]
+    except (BrokenProcessPool, RuntimeError):
+        # Broken, or shut down by a concurrent run that found it broken: parse in-process
+        _reset_pool(pool)
+        futures = [None] * len(paths)
+    for path, future in zip(paths, futures):
+        try:
+            yield _read_one(path) if future is None else future.result()
+        except BrokenProcessPool:
+            # A worker died mid-run: finish this file in-process; the next run gets a new pool
+            _reset_pool(pool)
+            yield _read_one(path)
+
+
+def iter_server_csvs(paths, workers=1, cache=None):
+    # Yields (path, per-server frame, rows, error, cache_hit) in input order.
+    # Cache hits are loaded lazily; misses are parsed (in a process pool when workers > 1)
+    # and stored back. Folding the results in input order keeps ties identical to the
+    # serial, uncached path.
+    keys = {}
+    if cache is not None:
+        keys = {path: cache.key_for(path) for path in paths}
+    misses = [path for path in paths if keys.get(path) is None or keys[path] not in cache]
+    parsed = _parse_all(misses, workers)
+
+    for path in paths:
+        if path not in misses:
+            hit = cache.get(keys[path])
+            if hit is not None:
+                yield path, hit[0], hit[1], None, True
+                continue
+            # Entry vanished or is unreadable: parse it inline
+            part, rows, error = _read_one(path)
+        else:
+            part, rows, error = next(parsed)
+        if keys.get(path) is not None and error is None:
+            cache.put(keys[path], part, rows)
+        yield path, part, rows, error, False
+
+
+def rank_servers(df):
+    df = df.sort_values(by=POWER_COL, ascending=False, kind='stable').reset_index(drop=True)
+    df['真实排名'] = df.index + 1
+    return df
@@ -0,0 +1,169 @@
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import STAGE_LABELS, STAGES, ExecutionLogger, PipelineError
+from results import result_items, result_summary
+
+STAGE_ORDER = [key for key, _ in STAGES]
+
+
+class Job:
+    """One pipeline run with its own workspace (uploads/ and downloads/ under the job folder)."""
+
+    def __init__(self, job_id, workspace):
+        self.id = job_id
+        self.workspace = workspace
+        self.upload_dir = os.path.join(workspace, 'uploads')
+        self.download_dir = os.path.join(workspace, 'downloads')
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.download_dir, exist_ok=True)
+
+        self.logger = ExecutionLogger()
+        self.status = 'queued'  # queued -> running -> done | failed
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.error_code = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self._items = {}
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    def progress(self):
+        if self.status == 'done':
+            return 1.0
+        if self.stage not in STAGE_ORDER:
+            return 0.0
+        return STAGE_ORDER.index(self.stage) / len(STAGE_ORDER)
+
+    @property
+    def is_batch(self):
+        return self.result is not None and 'plans' in self.result
+
+    def items(self, kind, plan=None):
+        # Result list for the paginated views, normalised once per job. plan: 0-based plan
+        # index of a batch job (IndexError if out of range)
+        key = (kind, plan)
+        if key not in self._items:
+            source = self.result if plan is None else self.result['plans'][plan]
+            self._items[key] = result_items(source, kind)
+        return self._items[key]
+
+    def summary(self):
+        # Progress fields of to_status() without the logs
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'stage_label': STAGE_LABELS.get(self.stage),
+            'progress': round(self.progress(), 3),
+            'log_count': len(self.logger.logs),
+        }
+
+    def to_status(self, since=0):
+        # `since` is the number of log entries the client already has
+        logs = self.logger.logs
+        count = len(logs)
+        status = self.summary()
+        status['logs'] = logs[since:count]
+        status['log_count'] = count
+        if self.status == 'done':
+            # The lists themselves are served page by page from /jobs/<id>/results/<kind>
+            status['result'] = result_summary(self.result)
+        if self.status == 'failed':
+            status['error'] = self.error
+        return status
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and removes finished jobs after ttl_seconds.
+
+    on_finish(job), if given, is called once each job reaches done or failed.
+    """
+
+    def __init__(self, folder, max_workers, ttl_seconds, on_finish=None):
+        self.folder = folder
+        self.ttl_seconds = ttl_seconds
+        self.on_finish = on_finish
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        os.makedirs(folder, exist_ok=True)
+
+    def create(self):
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        job = Job(job_id, os.path.join(self.folder, job_id))
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def get(self, job_id):
+        self.cleanup()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit(self, job, task):
+        # task(job) runs the work and returns the job result
+        job.future = self._pool.submit(self._run, job, task)
+        return job
+
+    def _run(self, job, task):
+        job.status = 'running'
+        # finished_at is set before the final status: cleanup() treats any finished job as
+        # having a finish time
+        try:
+            job.result = task(job)
+            job.finished_at = time.time()
+            job.status = 'done'
+        except PipelineError as e:
+            job.error, job.error_code = str(e), 400
+            job.logger.user(str(e), 'ERROR')
+            job.finished_at = time.time()
+            job.status = 'failed'
+        except Exception as e:
+            traceback.print_exc()
+            job.error, job.error_code = str(e), 500
+            job.logger.user(f"任务执行失败: {e}", 'ERROR')
+            job.finished_at = time.time()
+            job.status = 'failed'
+        finally:
+            if self.on_finish is not None:
+                try:
+                    self.on_finish(job)
+                except Exception:
+                    traceback.print_exc()
+
+    def cleanup(self):
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.finished and job.finished_at is not None
+                       and now - job.finished_at > self.ttl_seconds]
+            for job in expired:
+                del self._jobs[job.id]
+            known = set(self._jobs)
+        for job in expired:
+            shutil.rmtree(job.workspace, ignore_errors=True)
+        # Workspaces left behind by a previous process
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            if name in known or not os.path.isdir(path):
+                continue
+            try:
+                if now - os.path.getmtime(path) > self.ttl_seconds:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
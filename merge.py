@@ -0,0 +1,106 @@
+def fmt_pair(target, participant):
+    return f"[{target if target else '空'} + {participant if participant else '空'}]"
+
+
+def _ordered(a, b):
+    # (small, big) with missing servers dropped, padded back to two slots
+    ids = sorted(x for x in (a, b) if x is not None)
+    return (ids + [None, None])[:2]
+
+
+class MergeResult:
+    def __init__(self):
+        self.records = []  # swapped_log.csv rows, one per applied merge
+        self.applied = []  # (s1, s2, r1, r2, p1, p2) per applied merge, for logging
+        self.skipped = []  # (s1, s2) not in the plan or already in the same row
+        self.conflicts = []  # {'request', 'server', 'earlier', 'reason'}
+        self.changed_rows = set()
+
+
+class MergeEngine:
+    """Applies a batch of merge requests to the plan in memory.
+
+    The plan is held as two parallel lists (target, participant) indexed by position,
+    plus server -> position. Requests are applied in order: the requested pair goes into
+    the first server's row and the two leftover partners into the second server's row.
+    A request is rejected as a conflict if one of its servers already belongs to an
+    earlier merge, or if its leftover row holds a pair produced by an earlier merge.
+    """
+
+    def __init__(self, plan):
+        self.row_numbers = sorted(plan.rows)
+        self.targets = [plan.rows[r][0] for r in self.row_numbers]
+        self.participants = [plan.rows[r][1] for r in self.row_numbers]
+        pos_by_row = {r: i for i, r in enumerate(self.row_numbers)}
+        self._pos_of = {server: pos_by_row[plan.row_of(server)] for server in plan}
+        self._claimed = {}  # server -> merge request that placed it
+        self._locked = {}  # position -> merge request whose pair sits in that row
+
+    def _place(self, pos, target, participant):
+        self.targets[pos], self.participants[pos] = target, participant
+        for server in (target, participant):
+            if server:
+                self._pos_of[server] = pos
+
+    def _conflict(self, s1, s2, pos1, pos2):
+        for server in (s1, s2):
+            if server in self._claimed:
+                return server, self._claimed[server], f"区服 {server} 已在合并申请 {self._claimed[server]} 中"
+        for pos in (pos1, pos2):
+            if pos in self._locked:
+                return None, self._locked[pos], f"行{self.row_numbers[pos]} 已是合并申请 {self._locked[pos]} 的结果，剩余组会将其覆盖"
+        return None
+
+    def apply(self, requests):
+        result = MergeResult()
+        for s1, s2 in requests:
+            request = f"{s1}+{s2}"
+            pos1, pos2 = self._pos_of.get(s1), self._pos_of.get(s2)
+            if pos1 is None or pos2 is None:
+                result.skipped.append((s1, s2))
+                continue
+            if pos1 == pos2:
+                # Already paired: nothing to move, but later requests must not split them
+                self._claimed.setdefault(s1, request)
+                self._claimed.setdefault(s2, request)
+                self._locked.setdefault(pos1, request)
+                result.skipped.append((s1, s2))
+                continue
+
+            conflict = self._conflict(s1, s2, pos1, pos2)
+            if conflict is not None:
+                server, earlier, reason = conflict
+                result.conflicts.append({'request': request, 'server': server, 'earlier': earlier, 'reason': reason})
+                continue
+
+            v1_t, v1_p = self.targets[pos1], self.participants[pos1]
+            v2_t, v2_p = self.targets[pos2], self.participants[pos2]
+            # Leftover partners: whichever of each row is not the requested server
+            p1 = v1_p if v1_t == s1 else v1_t
+            p2 = v2_p if v2_t == s2 else v2_t
+
+            new_1 = _ordered(s1, s2)
+            new_2 = _ordered(p1, p2)
+            self._place(pos1, *new_1)
+            self._place(pos2, *new_2)
+            self._claimed[s1] = self._claimed[s2] = request
+            self._locked[pos1] = request
+
+            r1, r2 = self.row_numbers[pos1], self.row_numbers[pos2]
+            result.changed_rows.update((r1, r2))
+            result.applied.append((s1, s2, r1, r2, p1, p2))
+            result.records.append({
+                '合并申请': request,
+                '原始行号1': r1, '原始行号2': r2,
+                'Before1': fmt_pair(v1_t, v1_p), 'After1': fmt_pair(*new_1),
+                'Before2': fmt_pair(v2_t, v2_p), 'After2': fmt_pair(*new_2),
+                '状态': '已合并'
+            })
+        return result
+
+    def write_back(self, plan, rows):
+        # Copy the final state of the given rows into the plan index (marks them changed)
+        pos_by_row = {r: i for i, r in enumerate(self.row_numbers)}
+        for r_idx in sorted(rows):
+            pos = pos_by_row[r_idx]
+            plan.set_row(r_idx, self.targets[pos], self.participants[pos])
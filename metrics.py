@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+PREFIX = 'merge_tool'
+
+
+def process_rss():
+    # Resident set size of this process in bytes, or None where it can't be read.
+    # psutil is used when installed; otherwise /proc on Linux and the Win32 API on Windows.
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == 'win32':
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+        except (OSError, AttributeError):
+            pass
+    return None
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    body = ','.join(f'{k}="{str(v)}"' for k, v in sorted(labels.items()))
+    return '{' + body + '}'
+
+
+class MetricsRegistry:
+    """Cumulative run/stage metrics since process start, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._runs = {}  # status -> count
+        self._stage_buckets = {}  # stage -> per-bucket counts (last one is +Inf)
+        self._stage_sum = {}
+        self._stage_count = {}
+        self._processed = {}  # (stage, kind) -> total
+
+    def record_run(self, status, spans=()):
+        # spans: ExecutionLogger.spans of the finished run
+        with self._lock:
+            self._runs[status] = self._runs.get(status, 0) + 1
+            for span in spans:
+                self._observe_stage(span['stage'], span['seconds'])
+                for kind, value in span['counts'].items():
+                    key = (span['stage'], kind)
+                    self._processed[key] = self._processed.get(key, 0) + value
+
+    def _observe_stage(self, stage, seconds):
+        counts = self._stage_buckets.setdefault(stage, [0] * (len(self.buckets) + 1))
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self._stage_sum[stage] = self._stage_sum.get(stage, 0.0) + seconds
+        self._stage_count[stage] = self._stage_count.get(stage, 0) + 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append(f'# HELP {PREFIX}_runs_total Pipeline runs by final status.')
+            lines.append(f'# TYPE {PREFIX}_runs_total counter')
+            for status, count in sorted(self._runs.items()):
+                lines.append(f'{PREFIX}_runs_total{_labels(status=status)} {count}')
+
+            lines.append(f'# HELP {PREFIX}_stage_seconds Wall time per pipeline stage.')
+            lines.append(f'# TYPE {PREFIX}_stage_seconds histogram')
+            for stage, counts in sorted(self._stage_buckets.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{PREFIX}_stage_seconds_bucket{_labels(stage=stage, le=bound)} {count}')
+                lines.append(f'{PREFIX}_stage_seconds_bucket{_labels(stage=stage, le="+Inf")} {counts[-1]}')
+                lines.append(f'{PREFIX}_stage_seconds_sum{_labels(stage=stage)} {self._stage_sum[stage]:.6f}')
+                lines.append(f'{PREFIX}_stage_seconds_count{_labels(stage=stage)} {self._stage_count[stage]}')
+
+            lines.append(f'# HELP {PREFIX}_processed_total Rows, pairs and groups handled per stage.')
+            lines.append(f'# TYPE {PREFIX}_processed_total counter')
+            for (stage, kind), total in sorted(self._processed.items()):
+                lines.append(f'{PREFIX}_processed_total{_labels(stage=stage, kind=kind)} {total}')
+        return '\n'.join(lines) + '\n'
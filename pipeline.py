@@ -0,0 +1,675 @@
+import datetime
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from audit import PlanAudit
+from ingest import find_server_files, iter_server_csvs, merge_server_maxima, rank_servers, use_process_pool
+from metrics import process_rss
+from merge import MergeEngine
+from plan import read_plan, write_plan
+from report import AlertReport
+from rules import LOW_DAU_LIMIT, evaluate_primary_rules, pairs_to_arrays
+from snapshot import ServerSnapshot
+from suggest import suggest_pairs, write_suggestion_xlsx
+
+ALERT_CSV = 'alert_result.csv'
+SWAPPED_CSV = 'swapped_log.csv'
+RESULT_XLSX = 'result_plan.xlsx'
+AUDIT_CSV = 'plan_audit.csv'
+SUGGEST_XLSX = 'suggested_plan.xlsx'
+CROSS_PLAN_CSV = 'cross_plan_summary.csv'
+
+# run_pipeline result keys that name an output file
+OUTPUT_KEYS = ['alert_csv', 'swapped_csv', 'result_xlsx', 'audit_csv', 'suggest_xlsx']
+
+# Stages in execution order, as reported to the on_stage callback
+STAGES = [
+    ('ingest', '解析服务器数据'),
+    ('rank', '排序与排名'),
+    ('primary', '初级警报检测'),
+    ('secondary', '二次关联检测'),
+    ('audit', '全表审计'),
+    ('suggest', '配对建议'),
+    ('merge', '合并申请处理'),
+    ('write', '写出结果'),
+]
+
+
+class PipelineError(Exception):
+    """Problem with the user's input; reported back as a 400 rather than a crash."""
+
+
+STAGE_LABELS = dict(STAGES)
+
+
+class ExecutionLogger:
+    def __init__(self):
+        self.logs = []
+        self.spans = []
+        self.prefix = ''
+
+    def child(self, prefix):
+        # Logger for one plan of a batch: writes into this logger's log list with every
+        # message prefixed, but keeps its own stage spans
+        child = ExecutionLogger()
+        child.logs = self.logs
+        child.prefix = prefix
+        return child
+
+    @contextmanager
+    def span(self, stage):
+        # Times one pipeline stage. The yielded dict collects counts (rows, pairs, ...);
+        # the finished span is kept in self.spans and summarised in the dev log.
+        counts = {}
+        rss_before = process_rss()
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            seconds = time.perf_counter() - start
+            rss_after = process_rss()
+            rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            self.spans.append({
+                'stage': stage,
+                'label': STAGE_LABELS.get(stage, stage),
+                'seconds': round(seconds, 4),
+                'rss_delta_mb': round(rss_delta / 1e6, 1) if rss_delta is not None else None,
+                'counts': counts,
+            })
+            detail = ', '.join(f"{k}={v}" for k, v in counts.items())
+            # RSS is process-wide: concurrent jobs and plan threads show up in every open span
+            memory = f"，进程内存变化 {rss_delta / 1e6:+.1f}MB (含并发任务)" if rss_delta is not None else ''
+            self.dev(f"阶段耗时 [{STAGE_LABELS.get(stage, stage)}] {seconds:.3f}s{memory}" + (f" ({detail})" if detail else ''))
+
+    def total_seconds(self):
+        return round(sum(span['seconds'] for span in self.spans), 4)
+    
+    def user(self, message, level='INFO'):
+        self._add_log(level, message, 'user')
+        
+    def dev(self, message, level='DEBUG'):
+        self._add_log(level, message, 'dev')
+        
+    def _add_log(self, level, message, category):
+        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+        self.logs.append({
+            'time': timestamp, 
+            'level': level, 
+            'msg': f"{self.prefix}{message}",
+            'category': category
+        })
+
+
+def parse_server_pairs(text):
+    pairs = []
+    seen = set()
+    duplicates = []
+    
+    if not text:
+        return pairs, duplicates
+        
+    lines = text.strip().split('\n')
+    for line in lines:
+        parts = line.replace('，', ',').split(',')
+        if len(parts) >= 2:
+            try:
+                s1 = int(parts[0].strip())
+                s2 = int(parts[1].strip())
+                
+                # Sort tuple to treat (A, B) same as (B, A)
+                pair_key = tuple(sorted((s1, s2)))
+                
+                if pair_key in seen:
+                    duplicates.append(f"{s1} ↔ {s2}")
+                else:
+                    seen.add(pair_key)
+                    pairs.append((s1, s2))
+            except ValueError:
+                continue
+    return pairs, duplicates
+
+
+def load_snapshot(csv_items, logger, workers=1, cache=None, on_stage=None):
+    # csv_items: list of (path, display name) for the saved server CSVs
+    logger.user(f"正在处理 {len(csv_items)} 个服务器数据文件...")
+    csv_names = dict(csv_items)
+
+    if use_process_pool(list(csv_names), workers):
+        logger.dev(f"并行解析 CSV，进程数: {workers}")
+
+    servers = None
+    total_rows = 0
+    cache_hits = 0
+    with logger.span('ingest') as span:
+        # 尝试读取 CSV，跳过第一行；按块读取并即时归约为每个区服的最大战力行
+        for temp_path, part, rows, error, cached in iter_server_csvs(list(csv_names), workers, cache):
+            filename = csv_names[temp_path]
+            if error is not None:
+                logger.user(f"读取文件 {filename} 失败", 'ERROR')
+                logger.dev(f"CSV 读取异常: {error}", 'ERROR')
+                continue
+            servers = merge_server_maxima(servers, part)
+            total_rows += rows
+            cache_hits += cached
+            logger.dev(f"读取 CSV {filename} 成功{'（缓存命中）' if cached else ''}，行数: {rows}")
+        span['files'] = len(csv_names)
+        span['rows'] = total_rows
+
+    if cache is not None:
+        logger.user(f"数据缓存：命中 {cache_hits} 个，未命中 {len(csv_names) - cache_hits} 个")
+
+    if servers is None:
+        raise PipelineError("没有有效的 CSV 文件")
+
+    logger.user(f"数据合并完成，共 {total_rows} 条记录，{len(servers)} 个区服")
+
+    # Sort
+    if on_stage is not None:
+        on_stage('rank')
+    with logger.span('rank') as span:
+        logger.dev("执行数据排序: 前2名战力之和 (降序)")
+        df = rank_servers(servers)
+
+        # Build the per-server lookup once; every ID lookup below goes through it
+        snapshot = ServerSnapshot(df, len(df))
+        span['servers'] = len(snapshot)
+    logger.dev(f"构建区服索引完成，共 {len(snapshot)} 个区服")
+    return snapshot
+
+
+def append_day(snapshot, csv_item, logger, cache=None):
+    # Folds one more daily CSV into an existing snapshot instead of rebuilding from all days.
+    # Returns (snapshot, changed_ids): servers whose row or rank changed.
+    path, filename = csv_item
+    with logger.span('ingest') as span:
+        _, part, rows, error, cached = next(iter_server_csvs([path], 1, cache))
+        if error is not None:
+            logger.dev(f"CSV 读取异常: {error}", 'ERROR')
+            raise PipelineError(f"读取文件 {filename} 失败")
+        logger.dev(f"读取 CSV {filename} 成功{'（缓存命中）' if cached else ''}，行数: {rows}")
+        span['files'] = 1
+        span['rows'] = rows
+
+    with logger.span('rank') as span:
+        snapshot, changed_ids = snapshot.with_day(part)
+        span['servers'] = len(snapshot)
+        span['changed'] = len(changed_ids)
+    logger.user(f"增量更新 {filename}：{rows} 条记录，{len(changed_ids)} 个区服的数据或排名发生变化，"
+                f"当前共 {len(snapshot)} 个区服")
+    return snapshot, changed_ids
+
+
+def load_plan(xlsx_path, logger):
+    # One read-only pass over the plan; shared by the secondary check and the merge stage
+    plan = read_plan(xlsx_path)
+    logger.dev(f"构建合服计划索引完成，共 {len(plan.rows)} 行")
+    if not plan.rows:
+        logger.user("合服计划表没有数据行，二次检测与合并申请将不会生效", 'WARN')
+    return plan
+
+
+def parse_pairs(pairs_text, logger):
+    input_pairs, duplicates = parse_server_pairs(pairs_text)
+
+    if duplicates:
+        logger.user(f"发现并忽略 {len(duplicates)} 组重复检测对", 'WARN')
+        if len(duplicates) <= 5:
+            for dup in duplicates:
+                logger.dev(f"忽略重复: {dup}", 'WARN')
+        else:
+            logger.dev(f"重复列表 (前5个): {', '.join(duplicates[:5])}...", 'WARN')
+
+    logger.user(f"解析输入：共 {len(input_pairs)} 组有效检测区服")
+    return input_pairs
+
+
+def check_primary(snapshot, input_pairs, logger):
+    # Returns (alert_groups, normal_groups)
+    logger.dev("开始执行初级警报检测 (Primary Check)")
+    left_ids, right_ids = pairs_to_arrays(input_pairs)
+    primary = evaluate_primary_rules(snapshot, left_ids, right_ids)
+
+    missing_ids = primary.missing_ids(input_pairs)
+    if missing_ids:
+        skipped = int((~primary.found).sum())
+        logger.user(f"警告：{len(missing_ids)} 个区服数据缺失，已跳过 {skipped} 组", 'WARN')
+        if len(missing_ids) <= 5:
+            logger.dev(f"缺失区服: {', '.join(map(str, missing_ids))}", 'WARN')
+        else:
+            logger.dev(f"缺失区服 (前5个): {', '.join(map(str, missing_ids[:5]))}...", 'WARN')
+
+    alert_groups = primary.alert_groups()
+    normal_groups = primary.normal_groups()
+    for group in alert_groups:
+        logger.user(f"发现警报：{group['ids'][0]} 和 {group['ids'][1]} - {group['reason']}", 'WARN')
+
+    logger.user(f"检测完成：发现 {len(alert_groups)} 组警报，{len(normal_groups)} 组正常")
+    return alert_groups, normal_groups
+
+
+def check_secondary(snapshot, plan, alert_groups, logger, report=None):
+    # Returns the secondary alert groups. When a report is given, each primary group's rows
+    # are added to it followed by the rows of the secondary groups it triggered.
+    secondary_alert_groups = []
+
+    for group in alert_groups:
+        group_id = f"Group_{group['ids'][0]}_{group['ids'][1]}"
+        if report is not None:
+            report.add_group(group['ids'], group_id, group['reason'])
+
+        s1, s2 = group['ids'][0], group['ids'][1]
+
+        # Independent Secondary Checks
+        # Logic: For each server in the alerted pair (S1, S2), check their respective partners.
+        # If a Low DAU situation is found (either the server itself or its partner),
+        # create a NEW, INDEPENDENT alert group for that pair (Server + Partner).
+
+        # Helper to process secondary pair
+        def process_secondary_pair(main_id, partner_id):
+            if not partner_id:
+                return
+
+            main_dau = snapshot.dau_of(main_id)
+            partner_dau = snapshot.dau_of(partner_id)
+
+            # Check DAU conditions
+            alerts = []
+            if main_dau is not None and main_dau <= LOW_DAU_LIMIT:
+                alerts.append(f"{main_id}本身DAU过低({int(main_dau)})")
+            if partner_dau is not None and partner_dau <= LOW_DAU_LIMIT:
+                alerts.append(f"关联服{partner_id}DAU过低({int(partner_dau)})")
+
+            if alerts:
+                # Create a unique group for this secondary relationship
+                # Sort IDs to ensure consistent Group ID (e.g. Group_Small_Big)
+                pair_ids = sorted([main_id, partner_id])
+                sec_group_id = f"Group_{pair_ids[0]}_{pair_ids[1]}"
+                reason_str = " | ".join(alerts)
+
+                # Log it
+                logger.user(f"触发独立二次警报: {sec_group_id} - {reason_str}", 'WARN')
+
+                # Add to summary list for frontend
+                secondary_alert_groups.append({
+                    'ids': pair_ids,
+                    'reason': reason_str
+                })
+
+                # Add rows to CSV data: main server row, then partner row
+                if report is not None:
+                    report.add_group([main_id, partner_id], sec_group_id, reason_str)
+
+        # Check S1 and its partner
+        process_secondary_pair(s1, plan.partner_of(s1))
+
+        # Check S2 and its partner
+        process_secondary_pair(s2, plan.partner_of(s2))
+
+    return secondary_alert_groups
+
+
+def run_plan_audit(snapshot, plan, logger, audit=None):
+    # Every plan row through the primary and low-DAU rules; returns the ranked risky rows.
+    # An existing PlanAudit (kept current incrementally) is reported as is.
+    logger.dev("开始执行全表审计 (Plan Audit)")
+    if audit is None:
+        audit = PlanAudit(snapshot, plan)
+    frame, stats = audit.frame(), audit.stats()
+    if stats['incomplete_rows']:
+        logger.dev(f"全表审计跳过 {stats['incomplete_rows']} 行 (目标服或参与服为空)")
+    if stats['missing_rows']:
+        logger.user(f"全表审计：{stats['missing_rows']} 行缺少区服数据，仅按已有数据检测", 'WARN')
+    logger.user(f"全表审计完成：检测 {stats['pairs']} 行，风险行 {stats['risky_rows']} 行 "
+                f"(初级规则 {stats['primary_rows']} 行，DAU≤{LOW_DAU_LIMIT} {stats['low_dau_rows']} 行)",
+                'WARN' if stats['risky_rows'] else 'INFO')
+    return frame, stats
+
+
+def plan_server_ids(plan):
+    # Numeric server IDs listed anywhere in the plan's 目标服/参与服 columns
+    ids = pd.to_numeric(pd.Series(list(plan), dtype=object), errors='coerce').dropna()
+    return ids.astype('int64').tolist()
+
+
+def run_pair_suggestion(snapshot, logger, plan=None):
+    # Proposes a rule-passing pairing for the plan's servers (all snapshot servers without a plan)
+    server_ids = None if plan is None else plan_server_ids(plan)
+    frame, stats = suggest_pairs(snapshot, server_ids)
+    logger.user(f"配对建议完成：{stats['servers']} 个区服，生成 {stats['pairs']} 组配对，"
+                f"未配对 {stats['unpaired']} 个")
+    if stats['low_dau_pairs']:
+        logger.user(f"{stats['low_dau_pairs']} 组配对包含 DAU≤{LOW_DAU_LIMIT} 的区服", 'WARN')
+    if stats['missing']:
+        logger.user(f"{stats['missing']} 个计划区服缺少数据，未参与配对", 'WARN')
+    return frame, stats
+
+
+def apply_merge_requests(plan, normal_groups, logger):
+    # Applies the merge requests to the plan index in one in-memory pass.
+    # Returns (swap log records, conflicts); conflicting requests are left unapplied.
+    logger.user("正在处理正常组的合并申请...")
+    engine = MergeEngine(plan)
+    merge = engine.apply(normal_groups)
+
+    for record, (s1, s2, r1_idx, r2_idx, p1, p2) in zip(merge.records, merge.applied):
+        # Human readable change log
+        change_log = (
+            f"组1 (行{r1_idx}): {record['Before1']} ➔ {record['After1']} (合并目标)\n"
+            f"   组2 (行{r2_idx}): {record['Before2']} ➔ {record['After2']} (剩余自动组队)"
+        )
+        logger.user(f"✅ 成功合并 {s1} + {s2}\n   {change_log}", 'SUCCESS')
+        logger.dev(f"执行合并 ({s1}, {s2}) -> Row {r1_idx}, Leftovers ({p1}, {p2}) -> Row {r2_idx}")
+
+    for s1, s2 in merge.skipped:
+        logger.dev(f"无法合并 ({s1}, {s2}): 未找到匹配行或已在同一行")
+
+    if merge.conflicts:
+        logger.user(f"发现 {len(merge.conflicts)} 条冲突的合并申请，已跳过", 'WARN')
+        for conflict in merge.conflicts:
+            logger.user(f"⚠️ 合并申请 {conflict['request']} 冲突: {conflict['reason']}", 'WARN')
+
+    # Row 1 now contains s1 and s2, Row 2 contains p1 and p2 (also marks both rows for the writer)
+    engine.write_back(plan, merge.changed_rows)
+    return merge.records, merge.conflicts
+
+
+def check_pairs(snapshot, plan, input_pairs, logger, dry_run_merge=False):
+    # Primary and secondary verdicts for a batch of pairs without writing any file.
+    # With dry_run_merge the merge requests are applied to a copy of the plan and the
+    # resulting swap records are returned as the diff.
+    alert_groups, normal_groups = check_primary(snapshot, input_pairs, logger)
+    secondary_alert_groups = check_secondary(snapshot, plan, alert_groups, logger)
+    missing_ids = list(dict.fromkeys(s for pair in input_pairs for s in pair if s not in snapshot))
+
+    result = {
+        'alert_groups': alert_groups,
+        'secondary_alert_groups': secondary_alert_groups,
+        'normal_groups': [list(pair) for pair in normal_groups],
+        'missing_ids': missing_ids,
+    }
+    if dry_run_merge:
+        result['merge_diff'], result['merge_conflicts'] = apply_merge_requests(plan.copy(), normal_groups, logger)
+    return result
+
+
+def run_pipeline(csv_items, xlsx_path, pairs_text, out_dir, logger, workers=1, cache=None, on_stage=None,
+                 audit=False, suggest=False):
+    # csv_items: list of (path, display name) for the saved server CSVs.
+    # Writes alert_result.csv, swapped_log.csv and result_plan.xlsx into out_dir (plus
+    # plan_audit.csv with audit=True and suggested_plan.xlsx with suggest=True) and
+    # returns the summary shown on the result page.
+    if on_stage is None:
+        on_stage = lambda stage: None
+
+    # 2. Process CSVs (Merge Multiple), then sort and rank
+    on_stage('ingest')
+    snapshot = load_snapshot(csv_items, logger, workers, cache, on_stage)
+
+    result, _ = process_plan(snapshot, xlsx_path, pairs_text, out_dir, logger, on_stage, audit, suggest)
+    logger.user(f"所有任务处理完成！(耗时 {logger.total_seconds():.2f}s)", 'SUCCESS')
+    return result
+
+
+def process_plan(snapshot, xlsx_path, pairs_text, out_dir, logger, on_stage=None, audit=False, suggest=False,
+                 prefix=''):
+    # Every stage after ingest for one plan and its pairs, against an already ranked snapshot.
+    # Output files are named prefix + the usual name. Returns (result, plan index).
+    if on_stage is None:
+        on_stage = lambda stage: None
+
+    input_pairs = parse_pairs(pairs_text, logger)
+
+    # 3. Primary Alert Check
+    on_stage('primary')
+    with logger.span('primary') as span:
+        alert_groups, normal_groups = check_primary(snapshot, input_pairs, logger)
+        span['pairs'] = len(input_pairs)
+        span['alert_groups'] = len(alert_groups)
+
+    # 4. Secondary Alert Check
+    on_stage('secondary')
+    with logger.span('secondary') as span:
+        logger.dev("加载 XLSX 进行二次关联检测")
+        plan = load_plan(xlsx_path, logger)
+
+        alert_report = AlertReport(snapshot)
+        secondary_alert_groups = check_secondary(snapshot, plan, alert_groups, logger, alert_report)
+        span['plan_rows'] = len(plan.rows)
+        span['secondary_groups'] = len(secondary_alert_groups)
+
+    # Whole-plan audit, on the plan as uploaded (before merge requests rewrite it)
+    audit_frame = None
+    if audit:
+        on_stage('audit')
+        with logger.span('audit') as span:
+            audit_frame, audit_stats = run_plan_audit(snapshot, plan, logger)
+            span['pairs'] = audit_stats['pairs']
+            span['risky_rows'] = audit_stats['risky_rows']
+
+    # Suggested pairing for the same servers as the uploaded plan
+    suggest_frame = None
+    if suggest:
+        on_stage('suggest')
+        with logger.span('suggest') as span:
+            suggest_frame, suggest_stats = run_pair_suggestion(snapshot, logger, plan)
+            span['servers'] = suggest_stats['servers']
+            span['pairs'] = suggest_stats['pairs']
+
+    # 5. Merge Servers (Merge Requests)
+    on_stage('merge')
+    with logger.span('merge') as span:
+        swapped_log_data, merge_conflicts = apply_merge_requests(plan, normal_groups, logger)
+        span['requests'] = len(normal_groups)
+        span['merged'] = len(swapped_log_data)
+        span['conflicts'] = len(merge_conflicts)
+
+    on_stage('write')
+    with logger.span('write') as span:
+        # Create Alert CSV (grouped, with blank separator rows)
+        alert_report.write_csv(os.path.join(out_dir, prefix + ALERT_CSV))
+
+        if swapped_log_data:
+            swapped_df = pd.DataFrame(swapped_log_data)
+            output_swapped_path = os.path.join(out_dir, prefix + SWAPPED_CSV)
+            swapped_df.to_csv(output_swapped_path, index=False, encoding='utf-8-sig')
+        else:
+            pd.DataFrame().to_csv(os.path.join(out_dir, prefix + SWAPPED_CSV), index=False)
+
+        if audit_frame is not None:
+            audit_frame.to_csv(os.path.join(out_dir, prefix + AUDIT_CSV), index=False, encoding='utf-8-sig')
+        if suggest_frame is not None:
+            write_suggestion_xlsx(suggest_frame, os.path.join(out_dir, prefix + SUGGEST_XLSX))
+
+        output_xlsx_path = os.path.join(out_dir, prefix + RESULT_XLSX)
+        write_plan(xlsx_path, output_xlsx_path, plan)
+        span['report_rows'] = len(alert_report)
+        span['changed_rows'] = len(plan.changed_rows)
+
+    result = {
+        'alert_csv': prefix + ALERT_CSV,
+        'swapped_csv': prefix + SWAPPED_CSV,
+        'result_xlsx': prefix + RESULT_XLSX,
+        'alert_count': len(alert_groups),
+        'secondary_alert_count': len(secondary_alert_groups),
+        'swap_count': len(swapped_log_data),
+        'conflict_count': len(merge_conflicts),
+        'merge_conflicts': merge_conflicts,
+        'alert_preview': alert_groups,
+        'secondary_alert_preview': secondary_alert_groups,
+        'swap_preview': swapped_log_data,
+        'timings': logger.spans,
+    }
+    if audit_frame is not None:
+        result['audit_csv'] = prefix + AUDIT_CSV
+        result['audit_count'] = len(audit_frame)
+    if suggest_frame is not None:
+        result['suggest_xlsx'] = prefix + SUGGEST_XLSX
+        result['suggest_count'] = suggest_stats['pairs']
+    return result, plan
+
+
+def plan_file_prefix(index, name):
+    # Output file prefix for the index-th (1-based) plan of a batch, e.g. "2_华东_"
+    stem = re.sub(r'[^\w.-]+', '_', os.path.splitext(os.path.basename(name))[0]).strip('_.')
+    return f"{index}_{stem}_" if stem else f"{index}_"
+
+
+def cross_plan_overlaps(plan_names, plan_ids, snapshot=None):
+    # Servers listed in more than one plan: frame with 区服ID, 真实排名 (with a snapshot, empty
+    # for servers it lacks), 计划数 and the plan names, ordered by ID
+    frame = pd.DataFrame({
+        '区服ID': np.concatenate([np.asarray(ids, dtype=np.int64) for ids in plan_ids] or [np.empty(0, np.int64)]),
+        'plan': np.repeat(np.arange(len(plan_ids)), [len(ids) for ids in plan_ids]),
+    }).drop_duplicates()
+    counts = frame.groupby('区服ID')['plan'].transform('size')
+    shared = frame[counts > 1].sort_values(['区服ID', 'plan'], kind='stable')
+    names = np.asarray(plan_names, dtype=object)
+    grouped = shared.groupby('区服ID', sort=True)['plan']
+    summary = pd.DataFrame({
+        '区服ID': list(grouped.groups),
+        '计划数': grouped.size().to_numpy(),
+        '所在计划': [' | '.join(names[plans]) for plans in grouped.agg(list)],
+    })
+    if snapshot is not None:
+        pos = snapshot.positions(summary['区服ID'].to_numpy())
+        rank = pd.Series(snapshot.rank[np.where(pos >= 0, pos, 0)], dtype='Int64').where(pos >= 0)
+        summary.insert(1, '真实排名', rank)
+    return summary
+
+
+class _BatchStage:
+    # Reports the stage of the slowest plan to on_stage, so a batch's progress never moves back
+    def __init__(self, on_stage, count):
+        self.on_stage = on_stage
+        self.stages = [None] * count
+        self.lock = threading.Lock()
+        self.order = [key for key, _ in STAGES]
+
+    def for_plan(self, i):
+        def set_stage(stage):
+            with self.lock:
+                self.stages[i] = stage
+                slowest = min(self.stages, key=lambda s: -1 if s is None else self.order.index(s))
+                if slowest is not None:
+                    self.on_stage(slowest)
+        return set_stage
+
+
+def run_batch(csv_items, plans, out_dir, logger, workers=1, cache=None, on_stage=None, audit=False,
+              suggest=False, plan_workers=4):
+    """Checks several plans against one set of server CSVs.
+
+    plans: list of (display name, xlsx path, pairs text). The ranked snapshot is built once
+    and shared; the plans are then processed concurrently (plan_workers threads), each
+    writing its own outputs into out_dir under a "<n>_<name>_" prefix. Also writes
+    cross_plan_summary.csv with every server listed in more than one plan. Returns the
+    per-plan summaries under 'plans' plus the overlap list and batch totals.
+    """
+    if on_stage is None:
+        on_stage = lambda stage: None
+    if not plans:
+        raise PipelineError("没有合服计划表")
+    start = time.perf_counter()
+
+    on_stage('ingest')
+    snapshot = load_snapshot(csv_items, logger, workers, cache, on_stage)
+    # Builds the ID index's lookup table now rather than racing to build it in every thread
+    snapshot.positions(snapshot.ids[:1])
+    logger.user(f"批量处理 {len(plans)} 个合服计划...")
+
+    stage = _BatchStage(on_stage, len(plans))
+    names = [name for name, _, _ in plans]
+    prefixes = [plan_file_prefix(i + 1, name) for i, name in enumerate(names)]
+    # Plan names may repeat; the numbered prefix ("1_华东") identifies a plan in logs and summaries
+    keys = [prefix.rstrip('_') for prefix in prefixes]
+    loggers = [logger.child(f"[{key}] ") for key in keys]
+
+    def process(i):
+        _, xlsx_path, pairs_text = plans[i]
+        result, plan = process_plan(snapshot, xlsx_path, pairs_text, out_dir, loggers[i], stage.for_plan(i),
+                                    audit, suggest, prefixes[i])
+        loggers[i].user(f"计划处理完成 (耗时 {loggers[i].total_seconds():.2f}s)", 'SUCCESS')
+        return result, plan_server_ids(plan)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(plan_workers, len(plans)))) as pool:
+        outcomes = list(pool.map(process, range(len(plans))))
+
+    overlaps = cross_plan_overlaps(keys, [ids for _, ids in outcomes], snapshot)
+    overlaps.to_csv(os.path.join(out_dir, CROSS_PLAN_CSV), index=False, encoding='utf-8-sig')
+    if len(overlaps):
+        logger.user(f"跨计划检查：{len(overlaps)} 个区服同时出现在多个计划中", 'WARN')
+    else:
+        logger.user("跨计划检查：没有区服同时出现在多个计划中")
+
+    # Per-plan stage spans also count towards the batch (for /metrics); each plan's result
+    # keeps its own timings
+    shared_timings = list(logger.spans)
+    for child in loggers:
+        logger.spans.extend(child.spans)
+    logger.user(f"所有任务处理完成！{len(plans)} 个计划 (耗时 {time.perf_counter() - start:.2f}s)", 'SUCCESS')
+
+    return {
+        'plans': [dict(result, name=name, key=key) for name, key, (result, _) in zip(names, keys, outcomes)],
+        'cross_plan_csv': CROSS_PLAN_CSV,
+        'overlap_count': len(overlaps),
+        'plan_overlaps': [{'id': int(sid), 'plans': plan_list.split(' | ')}
+                          for sid, plan_list in zip(overlaps['区服ID'], overlaps['所在计划'])],
+        'alert_count': sum(result['alert_count'] for result, _ in outcomes),
+        'swap_count': sum(result['swap_count'] for result, _ in outcomes),
+        'conflict_count': sum(result['conflict_count'] for result, _ in outcomes),
+        'timings': shared_timings,
+    }
+
+
+def _local_inputs(csv_paths, xlsx_paths, out_dir):
+    csv_items = [(path, os.path.basename(path)) for path in find_server_files(csv_paths)]
+    if not csv_items:
+        raise PipelineError("没有找到 CSV 文件")
+    for xlsx_path in xlsx_paths:
+        if not os.path.isfile(xlsx_path):
+            raise PipelineError(f"合服计划表不存在: {xlsx_path}")
+    os.makedirs(out_dir, exist_ok=True)
+    return csv_items
+
+
+def _with_paths(result, out_dir):
+    for key in OUTPUT_KEYS:
+        if key in result:
+            result[key] = os.path.join(out_dir, result[key])
+    return result
+
+
+def run_files(csv_paths, xlsx_path, pairs_text, out_dir, logger=None, workers=1, cache=None,
+              audit=False, suggest=False):
+    """Runs the pipeline on local files, for scripts and the command line.
+
+    csv_paths may mix CSV files and directories of daily CSVs. Output files are written to
+    out_dir (created if missing). Returns (result, logger); result is the run_pipeline
+    summary with the output file names replaced by full paths.
+    """
+    logger = logger or ExecutionLogger()
+    csv_items = _local_inputs(csv_paths, [xlsx_path], out_dir)
+    result = run_pipeline(csv_items, xlsx_path, pairs_text, out_dir, logger, workers=workers, cache=cache,
+                          audit=audit, suggest=suggest)
+    return _with_paths(result, out_dir), logger
+
+
+def run_batch_files(csv_paths, plans, out_dir, logger=None, workers=1, cache=None, audit=False, suggest=False,
+                    plan_workers=4):
+    # run_batch on local files; plans: list of (xlsx path, pairs text). Returns (result, logger)
+    # with full output paths, per plan and for the cross-plan summary.
+    logger = logger or ExecutionLogger()
+    csv_items = _local_inputs(csv_paths, [xlsx_path for xlsx_path, _ in plans], out_dir)
+    named = [(os.path.basename(xlsx_path), xlsx_path, pairs_text) for xlsx_path, pairs_text in plans]
+    result = run_batch(csv_items, named, out_dir, logger, workers=workers, cache=cache, audit=audit,
+                       suggest=suggest, plan_workers=plan_workers)
+    result['plans'] = [_with_paths(plan, out_dir) for plan in result['plans']]
+    result['cross_plan_csv'] = os.path.join(out_dir, result['cross_plan_csv'])
+    return result, logger
@@ -0,0 +1,119 @@
+import shutil
+
+# openpyxl is imported inside read_plan/write_plan: it is a noticeable part of start-up time
+# and not every entry point (dataset API, CLI --help) touches a workbook
+
+# Highlight colour for rows rewritten by the merge stage
+MERGE_FILL_COLOR = "FFFF00"
+
+
+def locate_plan_columns(header_row):
+    # Returns 0-based (target, participant) column indexes; falls back to the first two columns
+    try:
+        return header_row.index('目标服'), header_row.index('参与服')
+    except ValueError:
+        return 0, 1
+
+
+class PlanIndex:
+    """Bidirectional index over the merge plan: server -> (row, partner)."""
+
+    def __init__(self, target_col_idx=0, part_col_idx=1):
+        self.target_col_idx = target_col_idx
+        self.part_col_idx = part_col_idx
+        self.rows = {}  # row number -> (target, participant)
+        self.changed_rows = set()
+        self._row_of = {}
+
+    def __contains__(self, server_id):
+        return server_id in self._row_of
+
+    def __iter__(self):
+        return iter(self._row_of)
+
+    def copy(self):
+        # Independent index for dry runs; row tuples are immutable so shallow dicts suffice
+        other = PlanIndex(self.target_col_idx, self.part_col_idx)
+        other.rows = dict(self.rows)
+        other.changed_rows = set(self.changed_rows)
+        other._row_of = dict(self._row_of)
+        return other
+
+    def add_row(self, r_idx, target, participant):
+        self.rows[r_idx] = (target, participant)
+        # First occurrence wins if a server is (wrongly) listed in several rows
+        if target:
+            self._row_of.setdefault(target, r_idx)
+        if participant:
+            self._row_of.setdefault(participant, r_idx)
+
+    def row_of(self, server_id):
+        return self._row_of.get(server_id)
+
+    def find(self, server_id):
+        r_idx = self._row_of.get(server_id)
+        if r_idx is None:
+            return None, None
+        target, participant = self.rows[r_idx]
+        return r_idx, (participant if target == server_id else target)
+
+    def partner_of(self, server_id):
+        return self.find(server_id)[1]
+
+    def set_row(self, r_idx, target, participant):
+        # Keep the index in sync after the merge stage rewrites a row
+        self.rows[r_idx] = (target, participant)
+        self.changed_rows.add(r_idx)
+        if target:
+            self._row_of[target] = r_idx
+        if participant:
+            self._row_of[participant] = r_idx
+
+
+def read_plan(path):
+    # Streaming read-only pass over the active sheet, extracting only the 目标服/参与服 columns.
+    # Row numbers are 1-based like openpyxl; data starts at row 2.
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        ws = wb.active
+        # Read-only mode trusts the sheet's <dimension> element, which streaming exporters
+        # often leave stale (e.g. "A1"); without this reset such plans read as empty
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+        header_row = list(next(rows, ()))
+        target_col_idx, part_col_idx = locate_plan_columns(header_row)
+        index = PlanIndex(target_col_idx, part_col_idx)
+        for r_idx, row in enumerate(rows, start=2):
+            target = row[target_col_idx] if target_col_idx < len(row) else None
+            participant = row[part_col_idx] if part_col_idx < len(row) else None
+            index.add_row(r_idx, target, participant)
+    finally:
+        wb.close()
+    return index
+
+
+def write_plan(src_path, out_path, plan):
+    # Only rows changed by the merge stage are written back (values + yellow fill);
+    # an unchanged plan is copied byte for byte without loading it.
+    if not plan.changed_rows:
+        shutil.copyfile(src_path, out_path)
+        return
+    from openpyxl import load_workbook
+    from openpyxl.styles import PatternFill
+
+    fill = PatternFill(start_color=MERGE_FILL_COLOR, end_color=MERGE_FILL_COLOR, fill_type="solid")
+    wb = load_workbook(src_path)
+    ws = wb.active
+    changed = sorted(plan.changed_rows)
+    for r_idx in changed:
+        target, participant = plan.rows[r_idx]
+        ws.cell(row=r_idx, column=plan.target_col_idx + 1).value = target
+        ws.cell(row=r_idx, column=plan.part_col_idx + 1).value = participant
+    # ws[r_idx] rescans every cell for max_column on each call; look the width up once
+    max_col = ws.max_column
+    for r_idx in changed:
+        for col in range(1, max_col + 1):
+            ws.cell(row=r_idx, column=col).fill = fill
+    wb.save(out_path)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+
+from ingest import REPORT_COLS
+
+# Columns added by the pipeline, placed before the source columns
+ADDED_COLS = ['真实排名', '警报组ID', '警报原因']
+
+# Rows handed to the CSV writer per batch
+WRITE_CHUNK_ROWS = 10000
+
+
+class AlertReport:
+    """Collects (server, group, reason) alert entries and writes alert_result.csv.
+
+    Rows are gathered from the snapshot by position in one step; groups are separated by
+    blank lines, emitted as all-NA rows while the CSV is streamed out.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.positions = []
+        self.group_ids = []
+        self.reasons = []
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, server_id, group_id, reason):
+        pos = self.snapshot.position(server_id)
+        if pos is None:
+            return False
+        self.positions.append(pos)
+        self.group_ids.append(group_id)
+        self.reasons.append(reason)
+        return True
+
+    def add_group(self, server_ids, group_id, reason):
+        for sid in server_ids:
+            self.add(sid, group_id, reason)
+
+    def write_csv(self, path):
+        if not self.positions:
+            pd.DataFrame().to_csv(path, index=False)
+            return
+
+        frame = self.snapshot.frame
+        positions = np.asarray(self.positions, dtype=np.int64)
+        group_ids = np.asarray(self.group_ids, dtype=str)
+        reasons = np.asarray(self.reasons, dtype=object)
+
+        # Contiguous groups ordered by group ID, then by real rank inside a group
+        order = np.lexsort((self.snapshot.rank[positions], group_ids))
+        positions, group_ids, reasons = positions[order], group_ids[order], reasons[order]
+
+        # -1 is not a row label, so reindex turns each inserted -1 into an all-NA separator row
+        breaks = np.flatnonzero(group_ids[1:] != group_ids[:-1]) + 1
+        positions = np.insert(positions, breaks, -1)
+        group_ids = np.insert(group_ids.astype(object), breaks, '')
+        reasons = np.insert(reasons, breaks, '')
+
+        source_cols = [c for c in ['真实排名'] + REPORT_COLS if c in frame.columns]
+        out = frame.reindex(index=positions, columns=source_cols)
+        # Integer columns came back as float because of the NA rows; nullable Int64 keeps
+        # them integral and writes the separators as empty cells
+        for col in source_cols:
+            if is_integer_dtype(frame[col].dtype):
+                out[col] = out[col].astype('Int64')
+        out.insert(1, '警报组ID', group_ids)
+        out.insert(2, '警报原因', reasons)
+
+        out.to_csv(path, index=False, encoding='utf-8-sig', chunksize=WRITE_CHUNK_ROWS)
@@ -0,0 +1,80 @@
+import math
+
+# Result list name -> key in the run_pipeline result
+RESULT_LISTS = {
+    'alerts': 'alert_preview',
+    'secondary_alerts': 'secondary_alert_preview',
+    'swaps': 'swap_preview',
+    'conflicts': 'merge_conflicts',
+    'overlaps': 'plan_overlaps',  # batch runs only
+}
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+
+def _alert_items(groups):
+    # Same group IDs as alert_result.csv
+    return [{'group_id': f"Group_{g['ids'][0]}_{g['ids'][1]}", 'ids': g['ids'], 'reason': g['reason']}
+            for g in groups]
+
+
+def result_items(result, kind):
+    # List of dicts for one result list, each with 'group_id' and 'reason' for filtering
+    items = result.get(RESULT_LISTS[kind]) or []
+    if kind in ('alerts', 'secondary_alerts'):
+        return _alert_items(items)
+    if kind == 'swaps':
+        return [dict(record, group_id=record['合并申请'], reason=record['状态']) for record in items]
+    if kind == 'overlaps':
+        return [dict(item, group_id=str(item['id']), reason=' | '.join(item['plans'])) for item in items]
+    return [dict(conflict, group_id=conflict['request']) for conflict in items]
+
+
+def result_summary(result):
+    # The result without its lists (served page by page instead); batch results are
+    # stripped per plan as well
+    summary = {k: v for k, v in result.items() if k not in RESULT_LISTS.values()}
+    if 'plans' in summary:
+        summary['plans'] = [result_summary(plan) for plan in summary['plans']]
+    return summary
+
+
+def filter_items(items, reason=None, group=None, q=None):
+    # Case-insensitive substring filters; q matches either the reason or the group ID
+    def has(value, needle):
+        return needle.lower() in str(value).lower()
+
+    if reason:
+        items = [item for item in items if has(item.get('reason', ''), reason)]
+    if group:
+        items = [item for item in items if has(item.get('group_id', ''), group)]
+    if q:
+        items = [item for item in items if has(item.get('reason', ''), q) or has(item.get('group_id', ''), q)]
+    return items
+
+
+def filter_logs(logs, category=None, level=None, q=None):
+    if category:
+        logs = [log for log in logs if log['category'] == category]
+    if level:
+        logs = [log for log in logs if log['level'] == level]
+    if q:
+        logs = [log for log in logs if q.lower() in log['msg'].lower()]
+    return logs
+
+
+def paginate(items, page=1, per_page=DEFAULT_PER_PAGE):
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    total = len(items)
+    pages = max(1, math.ceil(total / per_page))
+    page = max(1, page)
+    start = (page - 1) * per_page
+    return {
+        'items': items[start:start + per_page],
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': pages,
+        'has_more': start + per_page < total,
+    }
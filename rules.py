@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+# Primary alert thresholds (see requirements_analysis.md)
+RANK_GAP_LIMIT = 5
+TOP_SHARE = 0.25
+TOPUP_MIN = 5000
+POWER_GAP_LIMIT = 1000000000
+# Secondary alert: a server (or its plan partner) at or below this DAU
+LOW_DAU_LIMIT = 5
+
+
+# Stands in for IDs that do not fit in int64 (mistyped input); no server has it, so such a
+# pair is reported as missing data like any other unknown ID
+OUT_OF_RANGE_ID = -1
+_INT64 = np.iinfo(np.int64)
+
+
+def pairs_to_arrays(pairs):
+    flat = [s if _INT64.min <= s <= _INT64.max else OUT_OF_RANGE_ID for pair in pairs for s in pair]
+    arr = np.asarray(flat, dtype=np.int64).reshape(-1, 2)
+    return arr[:, 0], arr[:, 1]
+
+
+def _join_reasons(parts, sep):
+    # Element-wise join of the non-empty strings in each column of `parts`
+    joined = parts[0]
+    for part in parts[1:]:
+        glue = np.where((joined != '') & (part != ''), sep, '').astype(object)
+        joined = joined + glue + part
+    return joined
+
+
+class PrimaryCheckResult:
+    def __init__(self, left, right, left_found, right_found, alert, reasons, hits=None, rank_gap=None, power_gap=None):
+        self.left = left
+        self.right = right
+        self.left_found = left_found
+        self.right_found = right_found
+        self.found = left_found & right_found
+        self.alert = alert
+        self.reasons = reasons
+        # Per pair: number of rules triggered, |rank difference|, |power difference| (0 where not found)
+        n = len(left)
+        self.hits = np.zeros(n, dtype=np.int8) if hits is None else hits
+        self.rank_gap = np.zeros(n, dtype=np.int64) if rank_gap is None else rank_gap
+        self.power_gap = np.zeros(n, dtype=np.float64) if power_gap is None else power_gap
+
+    def missing_ids(self, pairs=None):
+        # Unique IDs without snapshot data, in input order. Pass the original pairs to report
+        # IDs that pairs_to_arrays replaced with OUT_OF_RANGE_ID as typed.
+        if pairs is None:
+            pairs = zip(self.left.tolist(), self.right.tolist())
+        seen = {}
+        for (s1, s2), ok1, ok2 in zip(pairs, self.left_found.tolist(), self.right_found.tolist()):
+            if not ok1:
+                seen.setdefault(s1, None)
+            if not ok2:
+                seen.setdefault(s2, None)
+        return list(seen)
+
+    def alert_groups(self):
+        idx = np.flatnonzero(self.alert)
+        return [{'ids': [s1, s2], 'reason': reason}
+                for s1, s2, reason in zip(self.left[idx].tolist(), self.right[idx].tolist(), self.reasons[idx].tolist())]
+
+    def normal_groups(self):
+        idx = np.flatnonzero(self.found & ~self.alert)
+        return list(zip(self.left[idx].tolist(), self.right[idx].tolist()))
+
+
+def primary_rule_masks(snapshot, pos1, pos2):
+    # Rule A/B/C masks plus |rank gap| and |power gap| for snapshot positions pos1[i], pos2[i]
+    rank1, rank2 = snapshot.rank[pos1], snapshot.rank[pos2]
+    rank_gap = np.abs(rank1 - rank2)
+    cond_a = rank_gap <= RANK_GAP_LIMIT
+
+    top_threshold = snapshot.total_servers * TOP_SHARE
+    cond_b = ((rank1 <= top_threshold) & (rank2 <= top_threshold) &
+              (snapshot.topup[pos1] >= TOPUP_MIN) & (snapshot.topup[pos2] >= TOPUP_MIN))
+
+    power_gap = np.abs(snapshot.power[pos1] - snapshot.power[pos2])
+    cond_c = power_gap <= POWER_GAP_LIMIT
+    return cond_a, cond_b, cond_c, rank_gap, power_gap
+
+
+def evaluate_primary_rules(snapshot, left, right):
+    # Evaluate the three primary alert rules for every (left[i], right[i]) pair in one pass
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+
+    pos1 = snapshot.positions(left)
+    pos2 = snapshot.positions(right)
+    found1, found2 = pos1 >= 0, pos2 >= 0
+    found = found1 & found2
+
+    if not found.any():
+        none = np.zeros(len(left), dtype=bool)
+        return PrimaryCheckResult(left, right, found1, found2, none, np.full(len(left), '', dtype=object))
+
+    # Clamp missing positions so the gathers stay in bounds; those rows are masked out by `found`
+    g1 = np.where(found, pos1, 0)
+    g2 = np.where(found, pos2, 0)
+
+    cond_a, cond_b, cond_c, rank_gap, power_gap = primary_rule_masks(snapshot, g1, g2)
+
+    cond_a &= found
+    cond_b &= found
+    cond_c &= found
+
+    text_a = pd.Series(rank_gap).astype(str).to_numpy(dtype=object)
+    parts = [
+        np.where(cond_a, '排名接近(差' + text_a + ')', ''),
+        np.where(cond_b, '高战高充(前25%)', ''),
+        np.where(cond_c, '战力接近(差<=10亿)', ''),
+    ]
+    reasons = _join_reasons([p.astype(object) for p in parts], '; ')
+
+    hits = cond_a.astype(np.int8) + cond_b + cond_c
+    return PrimaryCheckResult(left, right, found1, found2, cond_a | cond_b | cond_c, reasons,
+                              hits, np.where(found, rank_gap, 0), np.where(found, power_gap, 0))
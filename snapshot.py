@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+
+class ServerSnapshot:
+    """Per-server view of the ranked data: one row per 区服ID with O(1) lookups by ID."""
+
+    def __init__(self, df, total_servers=None):
+        # df must already be sorted by 前2名战力之和 (desc) and carry 真实排名,
+        # so the first occurrence of each 区服ID is its max-power row.
+        self.frame = df.drop_duplicates(subset='区服ID', keep='first').reset_index(drop=True)
+        self.total_servers = len(df) if total_servers is None else total_servers
+
+        self.ids = self.frame['区服ID'].to_numpy()
+        self.rank = self.frame['真实排名'].to_numpy()
+        self.power = self.frame['前2名战力之和'].to_numpy()
+        self.topup = self.frame['最高玩家累充金额'].to_numpy()
+        self.dau = self.frame['DAU'].to_numpy()
+
+        self._pos = dict(zip(self.ids.tolist(), range(len(self.ids))))
+        self._index = pd.Index(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, server_id):
+        return server_id in self._pos
+
+    def position(self, server_id):
+        return self._pos.get(server_id)
+
+    def positions(self, server_ids):
+        # Batch lookup for an array of IDs; -1 marks IDs that are not in the snapshot
+        return self._index.get_indexer(server_ids)
+
+    def dau_of(self, server_id):
+        pos = self._pos.get(server_id)
+        return None if pos is None else self.dau[pos]
+
+    def with_day(self, part):
+        """Folds one new day's per-server maxima into the ranking without a full rebuild.
+
+        part: the day's rows (normally already reduced to one per 区服ID). A server takes its
+        new row only if the power is strictly higher, exactly like merge_server_maxima, and
+        the winning rows are inserted into the existing rank order by binary search (after
+        equal powers, as a stable sort of the concatenation would place them).
+        Returns (snapshot, changed_ids): the IDs whose row or rank changed.
+        """
+        part = (part.sort_values(by='前2名战力之和', ascending=False, kind='stable')
+                    .drop_duplicates(subset='区服ID', keep='first'))
+        part_ids = part['区服ID'].to_numpy()
+        part_power = part['前2名战力之和'].to_numpy(dtype=np.float64)
+        old_pos = self.positions(part_ids)
+        known = old_pos >= 0
+        old_power = np.where(known, self.power[np.where(known, old_pos, 0)], np.nan)
+        wins = ~known | (part_power > old_power) | (np.isnan(old_power) & ~np.isnan(part_power))
+
+        keep = np.ones(len(self), dtype=bool)
+        keep[old_pos[wins & known]] = False
+        kept = np.flatnonzero(keep)
+        # Keys ascending (power descending); NaN sorts last on both sides like sort_values
+        insert_at = np.searchsorted(-self.power[kept].astype(np.float64), -part_power[wins], side='right')
+        source = np.insert(kept, insert_at, len(self) + np.arange(int(wins.sum())))
+
+        base = self.frame.drop(columns='真实排名')
+        pool = pd.concat([base, part.loc[wins, base.columns]], ignore_index=True)
+        frame = pool.take(source).reset_index(drop=True)
+        frame['真实排名'] = np.arange(1, len(frame) + 1)
+        snapshot = ServerSnapshot(frame, len(frame))
+
+        # Rank is position + 1 in both snapshots, so a moved position is a changed rank
+        prev = self.positions(snapshot.ids)
+        moved = (prev < 0) | (prev != np.arange(len(frame)))
+        changed = np.union1d(snapshot.ids[moved], part_ids[wins])
+        return snapshot, changed
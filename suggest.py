@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from rules import LOW_DAU_LIMIT, primary_rule_masks
+
+SUGGEST_COLS = ['目标服', '参与服', '目标服排名', '参与服排名', '排名差', '战力差', '备注']
+
+NOTE_OK = ''
+NOTE_LOW_DAU = f'含DAU≤{LOW_DAU_LIMIT}区服'
+NOTE_UNPAIRED = '未配对'
+NOTE_MISSING = '缺少区服数据'
+
+
+def _valid_pairs(snapshot, top, bottom):
+    # True where (top[i], bottom[i]) passes all primary rules
+    cond_a, cond_b, cond_c, _, _ = primary_rule_masks(snapshot, top, bottom)
+    return ~(cond_a | cond_b | cond_c)
+
+
+def _offset_match(snapshot, pool):
+    # pool: snapshot positions sorted by rank. Pairs pool[i] with pool[m-k+i], with k found by
+    # binary search over "every such pair passes the rules". Rules A and C only get easier as
+    # the partners move down the ranking, but rule B does not: a lower partner can still be in
+    # the top-25% band and meet the top-up minimum where the higher one did not. So validity
+    # is not monotone in k, and k need not be the largest valid offset. Every accepted k has
+    # all of its pairs checked, so the returned pairs always pass. Returns (top, bottom, middle).
+    m = len(pool)
+    lo, hi = 0, m // 2
+    while lo < hi:
+        k = (lo + hi + 1) // 2
+        if _valid_pairs(snapshot, pool[:k], pool[m - k:]).all():
+            lo = k
+        else:
+            hi = k - 1
+    k = lo
+    return pool[:k], pool[m - k:], pool[k:m - k]
+
+
+def _match_pool(snapshot, pool):
+    # Repeats the offset match on the unmatched middle block until no pair fits
+    tops, bottoms = [], []
+    while len(pool) >= 2:
+        top, bottom, pool = _offset_match(snapshot, pool)
+        if not len(top):
+            break
+        tops.append(top)
+        bottoms.append(bottom)
+    if not tops:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, pool
+    return np.concatenate(tops), np.concatenate(bottoms), pool
+
+
+def _by_rank(snapshot, positions):
+    return positions[np.argsort(snapshot.rank[positions], kind='stable')]
+
+
+def suggest_pairs(snapshot, server_ids=None):
+    """Proposes a pairing of the snapshot's servers (or of server_ids) that passes the primary rules.
+
+    Servers with DAU above the limit are matched among themselves first, then the low-DAU
+    servers among themselves, then whatever is left in one pool. Every proposed pair passes
+    the rules, but the pairing is greedy and not guaranteed to be maximal. Some servers can
+    stay unpaired even though a valid pairing for them exists. Returns (frame, stats): one
+    row per pair (smaller ID as 目标服) followed by unpaired servers.
+    """
+    if server_ids is None:
+        positions = np.arange(len(snapshot), dtype=np.int64)
+        missing = np.empty(0, dtype=np.int64)
+    else:
+        ids = pd.unique(np.asarray(list(server_ids), dtype=np.int64))
+        found = snapshot.positions(ids)
+        positions = found[found >= 0].astype(np.int64)
+        missing = ids[found < 0]
+
+    low = snapshot.dau[positions] <= LOW_DAU_LIMIT
+    tops, bottoms, rest = [], [], []
+    for pool in (positions[~low], positions[low]):
+        top, bottom, left_over = _match_pool(snapshot, _by_rank(snapshot, pool))
+        tops.append(top)
+        bottoms.append(bottom)
+        rest.append(left_over)
+    top, bottom, unpaired = _match_pool(snapshot, _by_rank(snapshot, np.concatenate(rest)))
+    tops.append(top)
+    bottoms.append(bottom)
+    top, bottom = np.concatenate(tops), np.concatenate(bottoms)
+
+    # Pair rows in ranking order of their higher-ranked server, smaller ID as 目标服
+    order = np.argsort(snapshot.rank[top], kind='stable')
+    top, bottom = top[order], bottom[order]
+    id1, id2 = snapshot.ids[top], snapshot.ids[bottom]
+    swap = id1 > id2
+    pos_t, pos_p = np.where(swap, bottom, top), np.where(swap, top, bottom)
+    _, _, _, rank_gap, power_gap = primary_rule_masks(snapshot, pos_t, pos_p)
+    has_low = (snapshot.dau[pos_t] <= LOW_DAU_LIMIT) | (snapshot.dau[pos_p] <= LOW_DAU_LIMIT)
+
+    unpaired = _by_rank(snapshot, unpaired)
+    pairs = pd.DataFrame({
+        '目标服': snapshot.ids[pos_t],
+        '参与服': pd.array(snapshot.ids[pos_p], dtype='Int64'),
+        '目标服排名': snapshot.rank[pos_t],
+        '参与服排名': pd.array(snapshot.rank[pos_p], dtype='Int64'),
+        '排名差': pd.array(rank_gap, dtype='Int64'),
+        '战力差': power_gap,
+        '备注': np.where(has_low, NOTE_LOW_DAU, NOTE_OK),
+    })
+    singles = pd.DataFrame({
+        '目标服': np.concatenate([snapshot.ids[unpaired], missing]),
+        '备注': [NOTE_UNPAIRED] * len(unpaired) + [NOTE_MISSING] * len(missing),
+        '目标服排名': pd.array(list(snapshot.rank[unpaired]) + [None] * len(missing), dtype='Int64'),
+    })
+    frame = pd.concat([pairs, singles], ignore_index=True).reindex(columns=SUGGEST_COLS)
+
+    stats = {
+        'servers': len(positions) + len(missing),
+        'pairs': len(pairs),
+        'low_dau_pairs': int(has_low.sum()),
+        'unpaired': len(unpaired),
+        'missing': len(missing),
+    }
+    return frame, stats
+
+
+def write_suggestion_xlsx(frame, path):
+    # Same layout the plan reader expects: header row with 目标服/参与服, one pair per row
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('合服计划')
+    ws.append(SUGGEST_COLS)
+    for row in frame.itertuples(index=False):
+        ws.append([None if pd.isna(v) else (v.item() if hasattr(v, 'item') else v) for v in row])
+    wb.save(path)
@@ -0,0 +1,41 @@
+import gzip
+import shutil
+
+import pytest
+
+from ingest import read_server_file, server_file_suffix
+
+CSV_TEXT = (
+    "0,1,2,3,4\n"
+    "区服ID,DAU,前2名战力之和,最高玩家累充金额,跨服ID\n"
+    "400001,10,300,0,1\n"
+    "400002,20,500,0,1\n"
+    "400001,11,400,0,1\n"
+)
+
+
+@pytest.mark.parametrize('name, suffix', [
+    ('day01.csv', '.csv'),
+    ('day01.CSV.GZ', '.csv.gz'),
+    ('day01.gz', '.gz'),
+    ('day01.parquet', '.parquet'),
+    ('days.zip', '.zip'),
+    ('day01.txt', '.csv'),
+])
+def test_server_file_suffix(name, suffix):
+    assert server_file_suffix(name) == suffix
+
+
+def test_gzip_without_csv_in_name_is_decompressed(tmp_path):
+    plain = tmp_path / 'day01.csv'
+    plain.write_text(CSV_TEXT, encoding='utf-8')
+    # Saved the way the upload handler does: input_<i> + server_file_suffix(original name)
+    packed = tmp_path / f"input_0{server_file_suffix('day01.gz')}"
+    with open(plain, 'rb') as src, gzip.open(packed, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+
+    expected, expected_rows = read_server_file(str(plain))
+    frame, rows = read_server_file(str(packed))
+    assert rows == expected_rows == 3
+    assert frame.equals(expected)
+    assert sorted(frame['区服ID'].tolist()) == [400001, 400002]
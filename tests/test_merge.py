@@ -0,0 +1,98 @@
+import random
+
+from merge import MergeEngine, fmt_pair
+from plan import PlanIndex
+
+
+def _plan(rows):
+    plan = PlanIndex()
+    for r_idx, (target, participant) in rows.items():
+        plan.add_row(r_idx, target, participant)
+    return plan
+
+
+def _sequential(rows, requests):
+    # The original algorithm: apply every request in order, re-pointing the index after each one
+    rows = dict(rows)
+    row_of = {server: r for r, pair in rows.items() for server in pair if server}
+    records = []
+    for s1, s2 in requests:
+        r1, r2 = row_of.get(s1), row_of.get(s2)
+        if not (r1 and r2 and r1 != r2):
+            continue
+        (v1_t, v1_p), (v2_t, v2_p) = rows[r1], rows[r2]
+        p1 = v1_p if v1_t == s1 else v1_t
+        p2 = v2_p if v2_t == s2 else v2_t
+        new_1 = (sorted(x for x in (s1, s2) if x is not None) + [None, None])[:2]
+        new_2 = (sorted(x for x in (p1, p2) if x is not None) + [None, None])[:2]
+        rows[r1], rows[r2] = tuple(new_1), tuple(new_2)
+        records.append({
+            '合并申请': f"{s1}+{s2}",
+            '原始行号1': r1, '原始行号2': r2,
+            'Before1': fmt_pair(v1_t, v1_p), 'After1': fmt_pair(*new_1),
+            'Before2': fmt_pair(v2_t, v2_p), 'After2': fmt_pair(*new_2),
+            '状态': '已合并'
+        })
+        for server in (s1, s2):
+            row_of[server] = r1
+        for server in (p1, p2):
+            if server:
+                row_of[server] = r2
+    return rows, records
+
+
+def _apply(rows, requests):
+    plan = _plan(rows)
+    engine = MergeEngine(plan)
+    result = engine.apply(requests)
+    engine.write_back(plan, result.changed_rows)
+    return plan, result
+
+
+def test_matches_sequential_merges_without_conflicts():
+    rng = random.Random(3)
+    servers = rng.sample(range(400000, 401000), 80)
+    rows = {r: (servers[2 * i], servers[2 * i + 1]) for i, r in enumerate(range(2, 42))}
+    rows[42] = (401500, None)  # a half-filled row
+
+    # Disjoint requests, each taking one server from two rows nobody has touched yet,
+    # plus one that reuses a leftover partner of an earlier merge
+    order = list(rows)
+    rng.shuffle(order)
+    requests = [(rows[order[i]][rng.randrange(2) if rows[order[i]][1] else 0], rows[order[i + 1]][0])
+                for i in range(0, 30, 2)]
+    first_leftover = rows[order[0]][1] if requests[0][0] == rows[order[0]][0] else rows[order[0]][0]
+    requests.append((first_leftover, rows[order[31]][1]))
+    requests.append((999, rows[order[33]][0]))  # not in the plan
+
+    plan, result = _apply(rows, requests)
+    expected_rows, expected_records = _sequential(rows, requests)
+
+    assert result.conflicts == []
+    assert len(result.records) == 16
+    assert result.records == expected_records
+    assert plan.rows == expected_rows
+    assert result.skipped == [(999, rows[order[33]][0])]
+
+
+def test_chained_request_is_a_conflict():
+    rows = {2: (1, 2), 3: (3, 4), 4: (5, 6)}
+    # 1+3 puts 1 and 3 into row 2; 3+5 would then split that fresh pair again
+    plan, result = _apply(rows, [(1, 3), (3, 5)])
+
+    assert [record['合并申请'] for record in result.records] == ['1+3']
+    assert result.conflicts == [{'request': '3+5', 'server': 3, 'earlier': '1+3',
+                                 'reason': '区服 3 已在合并申请 1+3 中'}]
+    assert plan.rows == {2: (1, 3), 3: (2, 4), 4: (5, 6)}
+    assert plan.changed_rows == {2, 3}
+
+
+def test_same_row_request_is_skipped_but_keeps_its_pair():
+    rows = {2: (1, 2), 3: (3, 4)}
+    plan, result = _apply(rows, [(1, 2), (2, 3)])
+
+    assert result.records == []
+    assert result.skipped == [(1, 2)]
+    assert [(conflict['request'], conflict['earlier']) for conflict in result.conflicts] == [('2+3', '1+2')]
+    assert plan.rows == rows
+    assert plan.changed_rows == set()
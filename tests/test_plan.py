@@ -0,0 +1,49 @@
+import re
+import zipfile
+
+from openpyxl import Workbook
+
+from plan import read_plan
+
+
+def _write_plan(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['目标服', '参与服'])
+    for row in rows:
+        ws.append(list(row))
+    wb.save(path)
+
+
+def _stale_dimension(src, dst):
+    # Rewrites the sheet's <dimension> to "A1", as some streaming exporters leave it
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for item in zin.infolist():
+            data = zin.read(item.filename)
+            if item.filename.startswith('xl/worksheets/sheet'):
+                data = re.sub(rb'<dimension ref="[^"]*"\s*/>', b'<dimension ref="A1"/>', data)
+            zout.writestr(item, data)
+
+
+def test_read_plan_ignores_stale_dimension(tmp_path):
+    rows = [(400000 + 2 * i, 400001 + 2 * i) for i in range(50)]
+    _write_plan(tmp_path / 'plan.xlsx', rows)
+    _stale_dimension(tmp_path / 'plan.xlsx', tmp_path / 'stale.xlsx')
+    assert b'<dimension ref="A1"/>' in zipfile.ZipFile(tmp_path / 'stale.xlsx').read('xl/worksheets/sheet1.xml')
+
+    plan = read_plan(str(tmp_path / 'stale.xlsx'))
+    assert len(plan.rows) == len(rows)
+    assert plan.rows[2] == rows[0]
+    assert plan.find(rows[-1][1]) == (len(rows) + 1, rows[-1][0])
+
+
+def test_read_plan_locates_columns_by_header(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['批次', '参与服', '目标服'])
+    ws.append(['A', 400002, 400001])
+    wb.save(tmp_path / 'plan.xlsx')
+
+    plan = read_plan(str(tmp_path / 'plan.xlsx'))
+    assert (plan.target_col_idx, plan.part_col_idx) == (2, 1)
+    assert plan.rows == {2: (400001, 400002)}
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from ingest import rank_servers
+from rules import evaluate_primary_rules, pairs_to_arrays
+from snapshot import ServerSnapshot
+
+
+def _snapshot(n=8):
+    frame = pd.DataFrame({
+        '区服ID': range(400000, 400000 + n),
+        'DAU': [100] * n,
+        '前2名战力之和': [float(10 ** 10 * (n - i)) for i in range(n)],
+        '最高玩家累充金额': [0] * n,
+    })
+    ranked = rank_servers(frame)
+    return ServerSnapshot(ranked, len(ranked))
+
+
+def test_out_of_range_ids_count_as_missing():
+    pairs = [(400000, 400007), (400003, 99999999999999999999), (-(2 ** 70), 400001)]
+    left, right = pairs_to_arrays(pairs)
+    primary = evaluate_primary_rules(_snapshot(), left, right)
+
+    assert primary.found.tolist() == [True, False, False]
+    assert primary.missing_ids(pairs) == [99999999999999999999, -(2 ** 70)]
+    assert primary.normal_groups() == [(400000, 400007)]
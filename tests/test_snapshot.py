@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingest import merge_server_maxima, rank_servers
+from snapshot import ServerSnapshot
+
+NAN = float('nan')
+
+
+def _day(rows):
+    # rows: (区服ID, 前2名战力之和, DAU); DAU tells which day a winning row came from
+    ids, power, dau = zip(*rows)
+    return pd.DataFrame({
+        '区服ID': list(ids),
+        'DAU': list(dau),
+        '前2名战力之和': [float(p) for p in power],
+        '最高玩家累充金额': [0] * len(rows),
+    })
+
+
+def _rebuild(days):
+    servers = None
+    for day in days:
+        servers = merge_server_maxima(servers, day)
+    ranked = rank_servers(servers)
+    return ServerSnapshot(ranked, len(ranked))
+
+
+def _columns(snapshot):
+    return snapshot.frame[['区服ID', 'DAU', '前2名战力之和', '最高玩家累充金额', '真实排名']]
+
+
+BASE = _day([(1, 50, 0), (2, 40, 0), (3, 40, 0), (4, 30, 0), (5, NAN, 0), (6, 10, 0)])
+
+CASES = {
+    # New server with the same power as two existing ones goes after both
+    'new row ties existing': _day([(7, 40, 1)]),
+    # Equal power is not an improvement: the old row (and its DAU) stays
+    'equal power keeps old row': _day([(2, 40, 1), (4, 30, 1)]),
+    # An improved server moves past others of the power it reaches
+    'improved row ties others': _day([(6, 40, 1), (4, 50, 1)]),
+    # Ties inside the new day keep the day's own order
+    'ties within the day': _day([(9, 20, 1), (8, 20, 1), (1, 60, 1), (10, 60, 1)]),
+    # A real power replaces NaN; NaN never replaces a real power
+    'nan handling': _day([(5, 35, 1), (3, NAN, 1), (11, NAN, 1)]),
+    'duplicates within the day': _day([(2, 45, 1), (2, 55, 2), (12, 5, 1), (12, 5, 2)]),
+    'nothing changes': _day([(1, 10, 1), (6, 5, 1)]),
+}
+
+
+@pytest.mark.parametrize('part', CASES.values(), ids=CASES.keys())
+def test_with_day_matches_full_rebuild(part):
+    old = _rebuild([BASE])
+    snapshot, changed = old.with_day(part)
+    expected = _rebuild([BASE, part])
+
+    pd.testing.assert_frame_equal(_columns(snapshot), _columns(expected), check_dtype=False)
+    assert snapshot.total_servers == expected.total_servers
+
+    # Changed: servers that are new, took a row from the day, or moved in the ranking
+    expected_changed = []
+    for server, dau, rank in zip(expected.ids, expected.dau, expected.rank):
+        pos = old.position(server)
+        if pos is None or dau != old.dau[pos] or rank != old.rank[pos]:
+            expected_changed.append(server)
+    assert sorted(np.asarray(changed).tolist()) == sorted(expected_changed)
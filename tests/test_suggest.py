@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from ingest import rank_servers
+from rules import TOPUP_MIN, evaluate_primary_rules
+from snapshot import ServerSnapshot
+from suggest import NOTE_UNPAIRED, suggest_pairs
+
+
+def test_suggested_pairs_pass_the_rules_with_mixed_topups():
+    # Alternating top-up around the minimum makes rule B non-monotone in the pairing offset
+    n = 40
+    rng = np.random.default_rng(7)
+    frame = pd.DataFrame({
+        '区服ID': range(400000, 400000 + n),
+        'DAU': rng.integers(0, 50, n),
+        '前2名战力之和': np.sort(rng.uniform(1e9, 4e10, n))[::-1],
+        '最高玩家累充金额': [TOPUP_MIN * (i % 2) for i in range(n)],
+    })
+    ranked = rank_servers(frame)
+    snapshot = ServerSnapshot(ranked, len(ranked))
+
+    suggestion, stats = suggest_pairs(snapshot)
+    pairs = suggestion[suggestion['备注'] != NOTE_UNPAIRED]
+    left, right = pairs['目标服'].to_numpy(), pairs['参与服'].to_numpy(dtype=np.int64)
+    primary = evaluate_primary_rules(snapshot, left, right)
+
+    assert stats['pairs'] == len(pairs) > 0
+    assert primary.found.all() and not primary.alert.any()
+    servers = np.concatenate([left, right, suggestion.loc[suggestion['备注'] == NOTE_UNPAIRED, '目标服']])
+    assert sorted(servers.tolist()) == list(range(400000, 400000 + n))